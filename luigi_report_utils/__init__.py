@@ -1,6 +1,47 @@
 """
 Package containing reporting utilities for use with the luigi library.
+
+Submodules are loaded lazily on first attribute access so that a bare
+`import luigi_report_utils` doesn't pull in pandas, pathos or luigi.
 """
 
-from . import inpt, records, value_translator, validate, parallel, tasks
-from .value_translator import ValueTranslationTable, ValueTranslator
+import importlib
+
+_submodules = (
+    "incremental",
+    "inpt",
+    "keyindex",
+    "memory",
+    "records",
+    "sortedmerge",
+    "stream",
+    "transforms",
+    "value_translator",
+    "validate",
+    "parallel",
+    "partitioned",
+    "pipeline",
+    "tasks",
+)
+
+# Attributes re-exported from submodules, mapped to the submodule they live in
+_exports = {
+    "ValueTranslationTable": "value_translator",
+    "ValueTranslator": "value_translator",
+}
+
+__all__ = list(_submodules) + list(_exports)
+
+
+# See: https://www.python.org/dev/peps/pep-0562/
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module(f".{name}", __name__)
+    if name in _exports:
+        module = importlib.import_module(f".{_exports[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
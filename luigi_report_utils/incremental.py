@@ -0,0 +1,205 @@
+"""
+Helpers for incremental report runs, where only records that were inserted or changed since
+the previous run are loaded and processed.
+
+Example:
+    snapshot = incremental.RecordSnapshot.load(self.input()["snapshot"])
+
+    df, diff = incremental.load_jsonl(self.input()["export"], field_defs, "ID", snapshot)
+    translator.translate(df)
+
+    df_prior = records.load_csv(self.input()["prior"])
+    df = incremental.merge_changes(df_prior, df, diff)
+
+    records.save_csv(self.output()["report"], df)
+    diff.snapshot.save(self.output()["snapshot"])
+"""
+
+import csv
+import hashlib
+import json
+
+import pandas
+
+from . import records
+
+import logging
+
+logger = logging.getLogger(f"{__package__}.incremental")
+
+
+def hash_record(record):
+    """Return a stable hash of the contents of a dictionary record"""
+    data = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class RecordSnapshot:
+    """A mapping of record key tuples to the hash of the record's contents, as of a
+    previous run.
+    """
+
+    def __init__(self, hashes=None):
+        self.hashes = dict(hashes) if hashes is not None else {}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, key):
+        return key in self.hashes
+
+    def get(self, key, default=None):
+        return self.hashes.get(key, default)
+
+    @classmethod
+    def load(cls, inpt):
+        """Load a snapshot previously written by `RecordSnapshot.save`"""
+        hashes = {}
+        with inpt.open("r") as f:
+            for line in f:
+                key, record_hash = json.loads(line)
+                hashes[tuple(key)] = record_hash
+        logger.info(f"Loaded snapshot of {len(hashes)} records from {inpt}")
+        return cls(hashes)
+
+    def save(self, output):
+        logger.info(f"Outputing snapshot of {len(self.hashes)} records to {output}")
+        with output.open("w") as f:
+            for key, record_hash in self.hashes.items():
+                f.write(json.dumps([list(key), record_hash]))
+                f.write("\n")
+
+
+class RecordDiff:
+    """Compares a stream of raw records against a `RecordSnapshot` from the previous run.
+
+    Pass the raw records through `RecordDiff.filter(...)` on their way to `load_records` and
+    only records that were inserted or changed will be loaded. Once the stream has been
+    consumed `snapshot` holds the snapshot for the current run, and `inserted`, `changed`
+    and `deleted` hold the keys of the records that differ.
+    """
+
+    def __init__(self, previous, key, field_defs=None):
+        self.previous = previous if previous is not None else RecordSnapshot()
+        self.key = records._maybe_make_list(key)
+        self.field_defs = field_defs
+        self.snapshot = RecordSnapshot()
+        self.inserted = []
+        self.changed = []
+
+    def filter(self, raw_records):
+        hashes = self.snapshot.hashes
+        for record in raw_records:
+            key = tuple(record.get(k) for k in self.key)
+            record_hash = hash_record(record)
+            if key in hashes:
+                raise KeyError(f"duplicate record key: {key!r}")
+            hashes[key] = record_hash
+
+            previous_hash = self.previous.get(key)
+            if previous_hash == record_hash:
+                continue
+
+            if previous_hash is None:
+                self.inserted.append(key)
+            else:
+                self.changed.append(key)
+            yield record
+
+    def load_keys(self, keys):
+        """Load raw record `keys` into a DataFrame of the key columns, applying the
+        transforms and types of the key fields' deffinitions, so they compare equal to the
+        key columns of the loaded records.
+        """
+        field_defs = {field_def.name: field_def for field_def in self.field_defs or []}
+        key_defs = []
+        for name in self.key:
+            field_def = field_defs.get(name)
+            if field_def is None:
+                key_defs.append(records.SchemaField(name))
+            else:
+                key_defs.append(
+                    records.SchemaField(
+                        name,
+                        type=field_def.type,
+                        transform=field_def.transform,
+                        none_value=field_def.none_value,
+                        vector_transform=field_def.vector_transform,
+                    )
+                )
+        return records.load_records(
+            (dict(zip(self.key, key)) for key in keys), key_defs
+        )
+
+    @property
+    def deleted(self):
+        return [key for key in self.previous.hashes if key not in self.snapshot]
+
+    def __str__(self):
+        return (
+            f"<RecordDiff(inserted={len(self.inserted)}, changed={len(self.changed)}, "
+            f"deleted={len(self.deleted)})>"
+        )
+
+
+def load_jsonl(inpt, field_defs, key, snapshot, **kwargs):
+    """Like `records.load_jsonl` but only loads records that were inserted or changed since
+    `snapshot` was taken. Returns a tuple of the DataFrame and the `RecordDiff`.
+    """
+    logger.info(f"Loading changed records from {inpt}")
+
+    diff = RecordDiff(snapshot, key, field_defs)
+    with inpt.open("r") as input_file:
+        raw_records = diff.filter(map(json.loads, input_file))
+        df = records.load_records(raw_records, field_defs, **kwargs)
+
+    logger.info(f"Loaded {df.shape[0]} changed records from {inpt}: {diff}")
+    return df, diff
+
+
+def load_csv(inpt, field_defs, key, snapshot, **kwargs):
+    """Like `records.load_csv` but only loads records that were inserted or changed since
+    `snapshot` was taken. Returns a tuple of the DataFrame and the `RecordDiff`.
+    """
+    logger.info(f"Loading changed records from {inpt}")
+
+    csv.register_dialect("strict", strict=True)
+
+    diff = RecordDiff(snapshot, key, field_defs)
+    with inpt.open("r") as input_file:
+        r = csv.DictReader(input_file, dialect="strict")
+        df = records.load_records(diff.filter(r), field_defs, **kwargs)
+
+    logger.info(f"Loaded {df.shape[0]} changed records from {inpt}: {diff}")
+    return df, diff
+
+
+def merge_changes(df_prior, df_changed, diff, on=None):
+    """Merge the processed changed records into the output of the previous run.
+
+    Rows of `df_prior` whose key columns `on` (defaults to the diff's key) match a changed or
+    deleted record are dropped and the rows of `df_changed` are appended.
+    """
+    on = records._maybe_make_list(on) if on is not None else diff.key
+
+    stale_keys = set(diff.changed)
+    stale_keys.update(diff.deleted)
+
+    # The snapshot holds the raw key values, process them like the loaded records and
+    # match the dtypes of the prior output
+    df_stale = diff.load_keys(stale_keys)
+    df_stale.columns = on
+    for col in on:
+        try:
+            df_stale[col] = df_stale[col].astype(df_prior[col].dtype)
+        except (ValueError, TypeError):
+            pass
+
+    if len(on) == 1:
+        stale = df_prior[on[0]].isin(df_stale[on[0]])
+    else:
+        stale = pandas.MultiIndex.from_frame(df_prior[on]).isin(
+            list(df_stale.itertuples(index=False, name=None))
+        )
+
+    return pandas.concat([df_prior.loc[~stale], df_changed], ignore_index=True)
@@ -3,6 +3,9 @@ A wrapper for file and string objects that provides an interface compatible with
 """
 
 import io
+import os
+import subprocess
+import tempfile
 import logging
 
 logger = logging.getLogger(f"{__package__}.inpt")
@@ -48,6 +51,100 @@ class BufferInpt(BaseInpt):
         return "<BufferInpt(...)>"
 
 
+def _chmod_default(path):
+    """Give a file created by `tempfile.mkstemp` (mode 0600) the permissions a newly
+    created file would get from the umask
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(path, 0o666 & ~umask)
+
+
+class _ProcessStream(io.RawIOBase):
+    """A raw binary stream over a process's stdout that optionally tees everything it reads
+    into a temporary file, which is moved onto `output_path` once the process exits
+    successfully.
+    """
+
+    def __init__(self, args, output_path=None, env=None):
+        self.args = args
+        self.output_path = output_path
+        self._proc = subprocess.Popen(args, stdout=subprocess.PIPE, env=env)
+
+        self._tee = None
+        if output_path is not None:
+            fd, self._tee_path = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(output_path)),
+                prefix=os.path.basename(output_path) + "-tmp-",
+            )
+            self._tee = os.fdopen(fd, "wb")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._proc.stdout.readinto(b)
+        if n and self._tee is not None:
+            self._tee.write(memoryview(b)[:n])
+        return n
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+
+        # Drain whatever the consumer didn't read so the output file is complete
+        if self._tee is not None:
+            while True:
+                data = self._proc.stdout.read(io.DEFAULT_BUFFER_SIZE)
+                if not data:
+                    break
+                self._tee.write(data)
+        self._proc.stdout.close()
+        returncode = self._proc.wait()
+
+        if self._tee is not None:
+            self._tee.close()
+            if returncode == 0:
+                _chmod_default(self._tee_path)
+                os.replace(self._tee_path, self.output_path)
+            else:
+                os.remove(self._tee_path)
+
+        if returncode != 0:
+            raise RuntimeError(
+                f"Program failed with return code={returncode}: {self.args!r}"
+            )
+
+
+class ProcessInpt(BaseInpt):
+    """Streams the stdout of a program while it is still running. Every call to `open()`
+    starts a new process. Closing the stream waits for the process to exit and raises a
+    RuntimeError if it failed.
+
+    If `output_path` is given, the output is also written to that path, atomically, once
+    the process exits successfully.
+    """
+
+    def __init__(self, args, output_path=None, env=None):
+        self.args = args
+        self.output_path = output_path
+        self.env = env
+
+    def open(self, mode="r"):
+        if mode not in ("r", "rb"):
+            raise ValueError(f"unsupported mode: {mode!r}")
+
+        logger.info(f"Running command: {' '.join(map(str, self.args))}")
+        raw = _ProcessStream(self.args, output_path=self.output_path, env=self.env)
+        if mode == "r":
+            return io.TextIOWrapper(io.BufferedReader(raw), encoding="utf-8")
+        return io.BufferedReader(raw)
+
+    def __str__(self):
+        return "<ProcessInpt({})>".format(self.args.__repr__())
+
+
 def from_path(path):
     return FilePathInpt(path)
 
@@ -58,3 +155,7 @@ def from_str(data, encoding="utf-8"):
 
 def from_bytes(buffer):
     return BufferInpt(buffer)
+
+
+def from_process(args, output_path=None, env=None):
+    return ProcessInpt(args, output_path=output_path, env=env)
@@ -0,0 +1,262 @@
+"""
+A persisted index of the keys in a reference extract, used to check key membership without
+loading the full reference DataFrame.
+
+The index is a sorted file of the distinct keys at `path` and a Bloom filter over them at
+`path + ".bloom"`. Membership is checked against the Bloom filter first, and only keys it
+reports as possibly present are checked exactly, in a single streaming pass over the
+sorted key file.
+
+Key values are compared as strings, so a key of `1` matches a csv value of `"1"`.
+
+Example:
+    # Build once, e.g. in the task that exports the reference table
+    keyindex.KeyIndex.build(inpt.from_path("customers.csv"), ["ID"], "customers.keys")
+
+    # Then use it in place of the reference DataFrame
+    index = keyindex.KeyIndex.load("customers.keys")
+    failures = validate.xref_integrity(df, "CUSTOMER_ID", index, "ID")
+    records.apply_exclusion_list(df, index, [("CUSTOMER_ID", "ID")])
+"""
+
+import json
+import math
+
+import numpy
+import pandas
+
+from . import records
+
+import logging
+
+logger = logging.getLogger(f"{__package__}.keyindex")
+
+
+def key_hashes(df, cols):
+    """Return a stable uint64 hash of the string value of the `cols` of each row"""
+    h = None
+    for col in cols:
+        values = df[col].astype(str).to_numpy(dtype=object)
+        col_h = pandas.util.hash_array(values)
+        h = col_h if h is None else (h * numpy.uint64(1000003)) ^ col_h
+    return h
+
+
+def _encode_keys(df, cols):
+    """Encode the string value of the `cols` of each row as a single string"""
+    columns = [df[col].astype(str) for col in cols]
+    return [json.dumps(list(key)) for key in zip(*columns)]
+
+
+class BloomFilter:
+    """A Bloom filter over uint64 hashes, see `key_hashes`"""
+
+    def __init__(self, num_bits, num_hashes, bits=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        if bits is None:
+            bits = numpy.zeros((num_bits + 7) // 8, dtype=numpy.uint8)
+        self.bits = bits
+
+    @classmethod
+    def for_capacity(cls, capacity, fp_rate):
+        """Size a filter to hold `capacity` keys with a false positive rate of `fp_rate`"""
+        capacity = max(capacity, 1)
+        num_bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, hashes):
+        # Double hashing, derive each of the k bit positions from two halves of the hash
+        hashes = numpy.asarray(hashes, dtype=numpy.uint64)
+        h1 = hashes & numpy.uint64(0xFFFFFFFF)
+        h2 = (hashes >> numpy.uint64(32)) | numpy.uint64(1)
+        for i in range(self.num_hashes):
+            yield (h1 + numpy.uint64(i) * h2) % numpy.uint64(self.num_bits)
+
+    def add(self, hashes):
+        for positions in self._positions(hashes):
+            bit = (positions & numpy.uint64(7)).astype(numpy.uint8)
+            numpy.bitwise_or.at(
+                self.bits, positions >> numpy.uint64(3), numpy.uint8(1) << bit
+            )
+
+    def contains(self, hashes):
+        """Return a boolean array, False where a hash is definitely not in the filter"""
+        result = numpy.ones(len(hashes), dtype=bool)
+        for positions in self._positions(hashes):
+            byte = self.bits[positions >> numpy.uint64(3)]
+            bit = (positions & numpy.uint64(7)).astype(numpy.uint8)
+            result &= ((byte >> bit) & numpy.uint8(1)).astype(bool)
+        return result
+
+    def false_positive_rate(self):
+        """Estimate the false positive rate of the filter from the fraction of bits set"""
+        filled = numpy.unpackbits(self.bits)[: self.num_bits].mean()
+        return float(filled) ** self.num_hashes
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            numpy.savez(f, bits=self.bits, num_bits=self.num_bits, num_hashes=self.num_hashes)
+
+    @classmethod
+    def load(cls, path):
+        with numpy.load(path) as data:
+            return cls(int(data["num_bits"]), int(data["num_hashes"]), data["bits"])
+
+
+def _bit_length(values):
+    """Return the number of bits needed to represent each of the uint64 `values`"""
+    values = values.copy()
+    lengths = numpy.zeros(len(values), dtype=numpy.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= (numpy.uint64(1) << numpy.uint64(shift))
+        lengths[high] += shift
+        values[high] >>= numpy.uint64(shift)
+    lengths += (values > 0).astype(numpy.uint8)
+    return lengths
+
+
+class HyperLogLog:
+    """A HyperLogLog sketch estimating the number of distinct uint64 hashes added to it,
+    see `key_hashes`. Uses `2 ** precision` registers, with a relative standard error of
+    about `1.04 / sqrt(2 ** precision)`.
+    """
+
+    def __init__(self, precision=14, registers=None):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"precision must be between 4 and 18, not {precision}")
+        self.precision = precision
+        if registers is None:
+            registers = numpy.zeros(1 << precision, dtype=numpy.uint8)
+        self.registers = registers
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add(self, hashes):
+        hashes = numpy.asarray(hashes, dtype=numpy.uint64)
+        width = 64 - self.precision
+        index = (hashes >> numpy.uint64(width)).astype(numpy.intp)
+        rest = hashes & numpy.uint64((1 << width) - 1)
+        # Position of the leftmost 1 bit in the remaining bits of the hash
+        rank = (width + 1 - _bit_length(rest).astype(numpy.int64)).astype(numpy.uint8)
+        numpy.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """Add the hashes counted by `other`, which must have the same precision"""
+        if other.precision != self.precision:
+            raise ValueError("can only merge sketches with the same precision")
+        numpy.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        harmonic = numpy.sum(numpy.ldexp(1.0, -self.registers.astype(int)))
+        estimate = alpha * m * m / harmonic
+
+        # Use linear counting for small cardinalities
+        zeros = int(numpy.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * math.log(m / zeros)
+        return float(estimate)
+
+
+class KeyIndex:
+    def __init__(self, path, cols, bloom):
+        self.path = path
+        self.cols = cols
+        self.bloom = bloom
+
+    @classmethod
+    def build(cls, source, cols, path, fp_rate=0.01):
+        """Build an index of the distinct values of the `cols` of `source`, which may be a
+        DataFrame or an inpt for a csv, and save it to `path`. Only the key columns of a
+        csv are loaded.
+        """
+        cols = records._maybe_make_list(cols)
+        if not isinstance(source, pandas.DataFrame):
+            source = records.load_csv(source, usecols=cols)
+
+        keys = sorted(set(_encode_keys(source, cols)))
+
+        bloom = BloomFilter.for_capacity(len(keys), fp_rate)
+        bloom.add(key_hashes(source, cols))
+
+        with open(path, "w") as f:
+            json.dump(cols, f)
+            f.write("\n")
+            for key in keys:
+                f.write(key)
+                f.write("\n")
+        bloom.save(path + ".bloom")
+
+        logger.info(f"Built key index of {len(keys)} keys at {path}")
+        return cls(path, cols, bloom)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            cols = json.loads(f.readline())
+        return cls(path, cols, BloomFilter.load(path + ".bloom"))
+
+    def _scan(self, candidates):
+        """Return the subset of the sorted list of encoded `candidates` found in the key file"""
+        found = set()
+        if not candidates:
+            return found
+
+        candidates = iter(candidates)
+        candidate = next(candidates)
+        with open(self.path, "r") as f:
+            f.readline()  # skip the header
+            for line in f:
+                key = line[:-1]
+                while candidate < key:
+                    candidate = next(candidates, None)
+                    if candidate is None:
+                        return found
+                if candidate == key:
+                    found.add(key)
+        return found
+
+    def left_columns(self, left_cols, right_cols):
+        """Given pairs of left-hand and right-hand key columns, check the right-hand columns
+        are exactly the columns of the index and return the left-hand columns in the
+        index's column order, to pass to `contains`.
+        """
+        left_cols = records._maybe_make_list(left_cols)
+        right_cols = records._maybe_make_list(right_cols)
+        if len(left_cols) != len(right_cols) or sorted(right_cols) != sorted(self.cols):
+            raise ValueError(
+                f"right-hand key columns {right_cols} don't match the index columns "
+                f"{self.cols}"
+            )
+        by_right = dict(zip(right_cols, left_cols))
+        return [by_right[col] for col in self.cols]
+
+    def contains(self, df, cols):
+        """Return a boolean array, True where the `cols` of a row of `df` are in the index"""
+        cols = records._maybe_make_list(cols)
+        if len(cols) != len(self.cols):
+            raise ValueError(
+                f"expected {len(self.cols)} key columns to match {self.cols}, got {cols}"
+            )
+
+        result = self.bloom.contains(key_hashes(df, cols))
+
+        # Check the keys that might be present against the key file
+        maybe = numpy.flatnonzero(result)
+        encoded = _encode_keys(df.iloc[maybe], cols)
+        found = self._scan(sorted(set(encoded)))
+        result[maybe] = [key in found for key in encoded]
+
+        logger.debug(
+            f"Key index lookup of {len(result)} keys, {len(maybe)} passed the Bloom filter, "
+            f"{int(result.sum())} found"
+        )
+        return result
+
+    def __str__(self):
+        return f"<KeyIndex({self.path!r})>"
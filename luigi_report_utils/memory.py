@@ -0,0 +1,198 @@
+"""
+Helpers for building DataFrames within a memory budget.
+
+`build_chunked` builds a DataFrame a chunk at a time, sizing each chunk from the measured
+size of the previous ones, and spills the finished chunks to disk once holding them would
+exceed the budget. The chunks are either concatenated into one frame, which has to fit in
+memory, or returned as a `ChunkSpiller` which loads them back one at a time, e.g. to be
+saved with `records.save_csv`. Sizes are estimated with `DataFrame.memory_usage(deep=True)`.
+"""
+
+import itertools
+import numbers
+import os
+import pickle
+import re
+import tempfile
+
+import pandas
+
+import logging
+
+logger = logging.getLogger(f"{__package__}.memory")
+
+# Number of input items in the first chunk, before anything has been measured
+_INITIAL_CHUNKSIZE = 10000
+
+# Smallest number of input items in a chunk
+_MIN_CHUNKSIZE = 100
+
+# Fraction of the budget a single chunk is sized to use, leaving room for the intermediate
+# objects created while building it.
+_CHUNK_FRACTION = 0.1
+
+_UNITS = {
+    "": 1,
+    "B": 1,
+    "KB": 1000,
+    "MB": 1000 ** 2,
+    "GB": 1000 ** 3,
+    "KIB": 1024,
+    "MIB": 1024 ** 2,
+    "GIB": 1024 ** 3,
+}
+
+
+def parse_size(size):
+    """Parse a size in bytes given as a number or a string like "512MB" or "2GiB" """
+    if isinstance(size, numbers.Real):
+        return int(size)
+
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([a-zA-Z]*)\s*", size)
+    if match is None or match.group(2).upper() not in _UNITS:
+        raise ValueError(f"invalid size: {size!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.1f}{unit}" if unit != "B" else f"{size}B"
+        size /= 1024
+
+
+def frame_size(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+class ChunkSpiller:
+    """Holds DataFrame chunks in memory until their estimated size would exceed
+    `memory_limit`, after which further chunks are pickled to a temporary directory.
+
+    Iterating over the spiller yields the chunks in order, loading each spilled chunk only
+    when it is reached. `close()` removes the spill files.
+    """
+
+    def __init__(self, memory_limit, spill_dir=None):
+        self.memory_limit = parse_size(memory_limit)
+        self.spill_dir = spill_dir
+        self._temp_dir = None
+        self._chunks = []
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self.spilled_chunks = 0
+        self.peak_bytes = 0
+        self.rows = 0
+        self.columns = None
+
+    @property
+    def shape(self):
+        return (self.rows, 0 if self.columns is None else len(self.columns))
+
+    def add(self, df, size=None):
+        size = frame_size(df) if size is None else size
+        self.peak_bytes = max(self.peak_bytes, self.memory_bytes + size)
+        self.rows += df.shape[0]
+        if self.columns is None:
+            self.columns = df.columns
+
+        if self.memory_bytes + size <= self.memory_limit:
+            self._chunks.append(df)
+            self.memory_bytes += size
+            return
+
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.TemporaryDirectory(
+                prefix="luigi_report_utils_spill", dir=self.spill_dir
+            )
+        path = os.path.join(self._temp_dir.name, f"chunk-{len(self._chunks)}.pickle")
+        with open(path, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._chunks.append((path, size))
+        self.spilled_bytes += size
+        self.spilled_chunks += 1
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if isinstance(chunk, tuple):
+                path, size = chunk
+                # The in-memory chunks are held alongside each reloaded one
+                self.peak_bytes = max(self.peak_bytes, self.memory_bytes + size)
+                with open(path, "rb") as f:
+                    chunk = pickle.load(f)
+            yield chunk
+
+    def concat(self, ignore_index=False):
+        """Concatenate all the chunks into one DataFrame. The spilled chunks are reloaded
+        for this, so every chunk and the result are held in memory at once and the
+        result has to fit in memory. Iterate over the spiller instead to load the chunks
+        one at a time.
+        """
+        df = pandas.concat(list(self), ignore_index=ignore_index)
+        self.peak_bytes = max(
+            self.peak_bytes, self.memory_bytes + self.spilled_bytes + frame_size(df)
+        )
+        self.close()
+        return df
+
+    def close(self):
+        self._chunks = []
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
+
+
+def build_chunked(
+    build, items, memory_limit, ignore_index=True, spill_dir=None, lazy=False
+):
+    """Build a DataFrame by calling `build(chunk)` on successive lists of `items` and
+    concatenating the results. Chunks are sized to use a fraction of `memory_limit` and
+    spilled to disk once the finished chunks would exceed it.
+
+    The concatenated frame has to fit in memory alongside the chunks, so the limit only
+    bounds the memory used while the chunks are built. If `lazy` is set the `ChunkSpiller`
+    is returned instead, and the chunks keep their own indexes. Consuming it a chunk at a
+    time keeps the peak within about `memory_limit` plus one chunk.
+    """
+    spiller = ChunkSpiller(memory_limit, spill_dir=spill_dir)
+    limit = spiller.memory_limit
+
+    items = iter(items)
+    chunksize = _INITIAL_CHUNKSIZE
+    total_items = 0
+    total_bytes = 0
+    while True:
+        chunk = list(itertools.islice(items, chunksize))
+        if not chunk:
+            break
+
+        df = build(chunk)
+        size = frame_size(df)
+        # Chunks left empty, e.g. by a filter, aren't kept
+        if df.shape[0] > 0:
+            spiller.add(df, size)
+        del df
+
+        # Size the next chunk from the average output size of an input item so far
+        total_items += len(chunk)
+        total_bytes += size
+        item_bytes = max(total_bytes / total_items, 1)
+        chunksize = max(_MIN_CHUNKSIZE, int(limit * _CHUNK_FRACTION / item_bytes))
+
+    if not spiller._chunks:
+        if not lazy:
+            return build([])
+        spiller.add(build([]))
+
+    logger.info(
+        f"Built {spiller.rows} records within a memory limit of {format_size(limit)}: "
+        f"peak estimated usage {format_size(spiller.peak_bytes)}, "
+        f"spilled {spiller.spilled_chunks} chunks ({format_size(spiller.spilled_bytes)})"
+    )
+    if lazy:
+        return spiller
+
+    df = spiller.concat(ignore_index=ignore_index)
+    peak = format_size(spiller.peak_bytes)
+    logger.info(f"Concatenated the chunks: peak estimated usage {peak}")
+    return df
@@ -1,14 +1,40 @@
-from pathos.pools import ThreadPool
-from pathos.helpers import cpu_count
+import os
 
+# Number of chunks the rows are split into when collecting writes
+_WRITE_CHUNKS = 64
 
-def df_apply(df, f, pool=None, n_cpus=None, return_df=True):
+
+def _make_pool(kind="thread", n_cpus=None, max_nodes=None):
+    """Return a pathos ThreadPool when `kind` is "thread", or a ProcessPool when it is
+    "process", with `n_cpus` workers (one per cpu by default) but at most `max_nodes`.
+    """
+    # pathos (and its dill/multiprocess stack) is slow to import, so defer
+    # loading it until a pool is actually needed.
+    from pathos.pools import ProcessPool, ThreadPool
+    from pathos.helpers import cpu_count
+
+    if kind not in ("thread", "process"):
+        raise ValueError(f"kind must be 'thread' or 'process', not {kind!r}")
+    nodes = n_cpus or cpu_count()
+    if max_nodes is not None:
+        nodes = min(nodes, max_nodes)
+    # pathos caches its pools by id, and a forked worker process inherits the cache with
+    # pools whose threads weren't copied into it, so key the pools by process as well.
+    pool_type = ThreadPool if kind == "thread" else ProcessPool
+    return pool_type(nodes, id=(os.getpid(), nodes))
+
+
+def df_apply(df, f, pool=None, n_cpus=None, return_df=True, collect_writes=False):
     """Apply the function `f` to each row in `df` in a parallel fashion.
+
+    By default values assigned to a row are written straight into `df`. If `collect_writes`
+    is set, rows are processed in chunks that return their assignments instead, and the
+    driver applies them with one assignment per column. This keeps workers from writing
+    into shared blocks, keeps column dtypes where the written values fit them and also
+    works with process pools.
     """
     if pool is None:
-        if n_cpus is None:
-            n_cpus = cpu_count()
-        pool = ThreadPool(n_cpus)
+        pool = _make_pool("thread", n_cpus)
 
     class RecordProxy:
         """A proxy object to wrap a `DataFrame.iat[row_i, col_i]` access model and
@@ -35,25 +61,54 @@ def df_apply(df, f, pool=None, n_cpus=None, return_df=True):
             """
             return lambda row_i: f(cls(row_i))
 
+        @classmethod
+        def wrap_chunk_func(cls, f):
+            """Like `wrap_map_func`, but the returned function expects a list of row indexes
+            and returns the results along with the values assigned to the rows, as a
+            dictionary of `column index -> (row indexes, values)`.
+            """
+
+            def _apply_chunk(rows):
+                results = []
+                writes = {}
+                for row_i in rows:
+                    record = cls(row_i, pending={})
+                    results.append(f(record))
+                    for i, value in record._pending.items():
+                        col_rows, col_values = writes.setdefault(i, ([], []))
+                        col_rows.append(row_i)
+                        col_values.append(value)
+                return results, writes
+
+            return _apply_chunk
+
         @property
         def index(self):
             return self.__row_i
 
-        def __init__(self, row_i):
+        def __init__(self, row_i, pending=None):
             self.__row_i = row_i
+            self._pending = pending
 
-        def __getitem__(self, key):
-            i = self._field_i(key)
+        def _value(self, i):
+            if self._pending is not None and i in self._pending:
+                return self._pending[i]
             return self.__df.iat[self.__row_i, i]
 
+        def __getitem__(self, key):
+            return self._value(self._field_i(key))
+
         def __setitem__(self, key, value):
             i = self._field_i(key)
-            self.__df.iat[self.__row_i, i] = value
+            if self._pending is not None:
+                self._pending[i] = value
+            else:
+                self.__df.iat[self.__row_i, i] = value
 
         def get(self, key, value=None):
             try:
                 i = self._field_i(key)
-                return self.__df.iat[self.__row_i, i]
+                return self._value(i)
             except KeyError:
                 return value
 
@@ -72,19 +127,62 @@ def df_apply(df, f, pool=None, n_cpus=None, return_df=True):
                 keys = self.__field_names
 
             return {
-                key: self.__df.iat[self.__row_i, i]
+                key: self._value(i)
                 for i, key in enumerate(self.__field_names)
                 if key in keys
             }
 
         def __iter__(self):
-            return (
-                self.__df.iat[self.__row_i, i] for i in range(len(self.__field_names))
-            )
+            return (self._value(i) for i in range(len(self.__field_names)))
 
-    results = pool.map(RecordProxy.wrap_map_func(f), range(df.shape[0]))
+    if collect_writes:
+        results = _apply_collecting_writes(df, RecordProxy.wrap_chunk_func(f), pool)
+    else:
+        results = pool.map(RecordProxy.wrap_map_func(f), range(df.shape[0]))
 
     if return_df:
         return df
     else:
         return results
+
+
+def _write_column(df, i, rows, values):
+    """Write `values` to the rows at positions `rows` of the `i`th column of `df`, as one
+    assignment of the column. The column keeps its dtype where the values fit it, e.g.
+    floats in a float64 column or strings in an Arrow string column, and is only widened
+    to object when they don't.
+    """
+    col = df.iloc[:, i].copy()
+    try:
+        col.iloc[rows] = values
+    except (TypeError, ValueError):
+        # e.g. a value that isn't one of a categorical column's categories
+        col = col.astype(object)
+        col.iloc[rows] = values
+    df[df.columns[i]] = col
+
+
+def _apply_collecting_writes(df, apply_chunk, pool):
+    """Run `apply_chunk` over chunks of the rows of `df` and apply the collected writes
+    to `df` once per column. Returns the per-row results in row order.
+    """
+    n_rows = df.shape[0]
+    chunksize = max(1, -(-n_rows // _WRITE_CHUNKS))
+    chunks = [
+        list(range(start, min(start + chunksize, n_rows)))
+        for start in range(0, n_rows, chunksize)
+    ]
+
+    results = []
+    writes = {}
+    for chunk_results, chunk_writes in pool.map(apply_chunk, chunks):
+        results.extend(chunk_results)
+        for i, (rows, values) in chunk_writes.items():
+            col_rows, col_values = writes.setdefault(i, ([], []))
+            col_rows.extend(rows)
+            col_values.extend(values)
+
+    for i, (rows, values) in writes.items():
+        _write_column(df, i, rows, values)
+
+    return results
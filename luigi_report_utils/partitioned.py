@@ -0,0 +1,247 @@
+"""
+A partitioned DataFrame backend which runs the records and validate APIs partition-parallel
+on a local process pool.
+
+A `PartitionedFrame` holds a list of pandas DataFrames. The loaders return one when they're
+given a `partition_size`, and the functions in `records`, `validate` and `value_translator`
+accept one wherever they accept a DataFrame. Row-local operations run on each partition
+independently, and validations that compare keys across rows hash-partition the rows on
+their key columns first so matching keys end up in the same partition.
+
+Example:
+    df = records.load_jsonl(inpt, field_defs, partition_size=100000)
+    df = records.expand_multivalued(df, expansion_paths)
+    translator.translate(df)
+    failures = list(validate.unique_keys(df, ["ID"]))
+    records.save_csv(output, df.compute())
+"""
+
+import csv
+import json
+import itertools
+
+import pandas
+
+from . import keyindex, parallel, records, validate
+
+import logging
+
+logger = logging.getLogger(f"{__package__}.partitioned")
+
+
+def _reindex(partitions):
+    """Give the partitions consecutive RangeIndexes, as if they were one DataFrame"""
+    start = 0
+    for partition in partitions:
+        stop = start + partition.shape[0]
+        partition.index = pandas.RangeIndex(start, stop)
+        start = stop
+    return partitions
+
+
+class PartitionedFrame:
+    """A DataFrame split row-wise into a list of pandas DataFrame partitions"""
+
+    def __init__(self, partitions, pool=None):
+        self.partitions = list(partitions)
+        self.pool = pool
+
+    @classmethod
+    def from_pandas(cls, df, npartitions, pool=None):
+        size = max(1, -(-df.shape[0] // npartitions))
+        partitions = [df.iloc[i : i + size] for i in range(0, df.shape[0], size)]
+        return cls(partitions or [df], pool=pool)
+
+    @property
+    def npartitions(self):
+        return len(self.partitions)
+
+    @property
+    def columns(self):
+        return self.partitions[0].columns
+
+    @property
+    def shape(self):
+        return (sum(p.shape[0] for p in self.partitions), len(self.columns))
+
+    def _get_pool(self):
+        if self.pool is None:
+            self.pool = parallel._make_pool("process")
+        return self.pool
+
+    def map(self, f):
+        """Return a list of `f(partition)` for each partition, computed in parallel"""
+        return self._get_pool().map(f, self.partitions)
+
+    def map_partitions(self, f):
+        """Return a new PartitionedFrame of `f(partition)` for each partition"""
+        return PartitionedFrame(self.map(f), pool=self.pool)
+
+    def shuffle(self, keys, npartitions=None):
+        """Return a new PartitionedFrame where rows are hash-partitioned on `keys`, so rows
+        with equal keys are always in the same partition.
+        """
+        npartitions = npartitions or self.npartitions
+
+        def _split(df):
+            buckets = _hash_keys(df, keys) % npartitions
+            return [df.loc[buckets == i] for i in range(npartitions)]
+
+        pieces = self.map(_split)
+        return PartitionedFrame(
+            [pandas.concat([p[i] for p in pieces]) for i in range(npartitions)],
+            pool=self.pool,
+        )
+
+    def compute(self):
+        """Concatenate the partitions into a single DataFrame"""
+        return pandas.concat(self.partitions)
+
+    def __str__(self):
+        return f"<PartitionedFrame(npartitions={self.npartitions})>"
+
+
+def _hash_keys(df, keys):
+    """Hash the `keys` of each row so that keys `pandas.merge` treats as equal hash equally,
+    whatever the column dtypes on each side (e.g. int64 10 and float64 10.0)
+    """
+    if keys is None:
+        keys = list(df.columns)
+    columns = {}
+    for key in keys:
+        values = df[key]
+        if pandas.api.types.is_numeric_dtype(values.dtype):
+            values = values.astype("float64")
+        elif isinstance(values.dtype, pandas.StringDtype):
+            values = values.astype(object)
+        columns[key] = values
+    return pandas.util.hash_pandas_object(pandas.DataFrame(columns), index=False).values
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_jsonl(inpt, field_defs, partition_size, pool=None, **kwargs):
+    """Partitioned version of `records.load_jsonl`. Lines are read `partition_size` at a time
+    and parsed and loaded in parallel.
+    """
+    logger.info(f"Loading records from {inpt}")
+    pool = pool or parallel._make_pool("process")
+
+    def _load(lines):
+        return records.load_records(map(json.loads, lines), field_defs, **kwargs)
+
+    with inpt.open("r") as input_file:
+        partitions = list(pool.imap(_load, _chunks(input_file, partition_size)))
+    # Keep an empty partition for an empty input, so the frame still has its columns
+    partitions = partitions or [_load([])]
+
+    df = PartitionedFrame(_reindex(partitions), pool=pool)
+    logger.info(f"Loaded {df.shape[0]} records into {df.npartitions} partitions")
+    return df
+
+
+def load_csv(inpt, field_defs, partition_size, pool=None, **kwargs):
+    """Partitioned version of `records.load_csv`. Rows are read `partition_size` at a time
+    and loaded in parallel.
+    """
+    logger.info(f"Loading records from {inpt}")
+    pool = pool or parallel._make_pool("process")
+
+    csv.register_dialect("strict", strict=True)
+
+    with inpt.open("r") as input_file:
+        r = csv.reader(input_file, dialect="strict")
+        fieldnames = next(r, [])
+
+        if field_defs is None:
+            field_defs = [
+                records.SchemaField(fieldname, type="str") for fieldname in fieldnames
+            ]
+
+        def _load(rows):
+            raw_records = (dict(zip(fieldnames, row)) for row in rows if row != [])
+            return records.load_records(raw_records, field_defs, **kwargs)
+
+        partitions = list(pool.imap(_load, _chunks(r, partition_size)))
+        partitions = partitions or [_load([])]
+
+    df = PartitionedFrame(_reindex(partitions), pool=pool)
+    logger.info(f"Loaded {df.shape[0]} records into {df.npartitions} partitions")
+    return df
+
+
+def expand_multivalued(df, expansion_paths, drop_mv=True, mode="aligned"):
+    partitions = df.map(
+        lambda p: records.expand_multivalued(
+            p, expansion_paths, drop_mv=drop_mv, mode=mode
+        )
+    )
+    return PartitionedFrame(_reindex(partitions), pool=df.pool)
+
+
+def apply_exclusion_list(df, f, match_tuples):
+    """Modifies the PartitionedFrame in-place like `records.apply_exclusion_list`"""
+    if not isinstance(f, (pandas.DataFrame, keyindex.KeyIndex)):
+        # Load the exclusion list once rather than in every partition
+        f = records.load_csv(f)
+
+    def _exclude(p):
+        records.apply_exclusion_list(p, f, match_tuples)
+        return p
+
+    df.partitions = df.map(_exclude)
+
+
+def apply_mappings(df, mappings):
+    return df.map_partitions(lambda p: records.apply_mappings(p, mappings))
+
+
+def translate(translator, df):
+    """Modifies the PartitionedFrame in-place like `ValueTranslator.translate`"""
+
+    def _translate(p):
+        translator.translate(p)
+        return p
+
+    df.partitions = df.map(_translate)
+
+
+def xref_integrity(df_left, on_left, df_right, on_right, ignore_blanks=False):
+    """Partitioned version of `validate.xref_integrity`. If `df_right` is a DataFrame it is
+    checked against every left-hand partition, otherwise both sides are hash-partitioned on
+    their keys first.
+    """
+    on_left = records._maybe_make_list(on_left)
+    on_right = records._maybe_make_list(on_right)
+
+    if isinstance(df_right, PartitionedFrame):
+        npartitions = df_left.npartitions
+        df_left = df_left.shuffle(on_left, npartitions)
+        right_partitions = df_right.shuffle(on_right, npartitions).partitions
+    else:
+        right_partitions = [df_right] * df_left.npartitions
+
+    def _check(args):
+        p_left, p_right = args
+        return list(
+            validate.xref_integrity(
+                p_left, on_left, p_right, on_right, ignore_blanks=ignore_blanks
+            )
+        )
+
+    pairs = list(zip(df_left.partitions, right_partitions))
+    return itertools.chain.from_iterable(df_left._get_pool().map(_check, pairs))
+
+
+def unique_keys(df, keys=None):
+    """Partitioned version of `validate.unique_keys`"""
+    df = df.shuffle(keys)
+    results = df.map(lambda p: list(validate.unique_keys(p, keys)))
+    return itertools.chain.from_iterable(results)
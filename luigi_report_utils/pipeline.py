@@ -0,0 +1,258 @@
+"""
+A declarative report pipeline which chains the records, value_translator and validate
+operations and runs them with as few full-frame passes as possible.
+
+A `Pipeline` is a list of stages. Consecutive row-local stages (expansion, exclusion,
+translation, mappings and xref checks against a loaded right-hand side) are fused: the
+frame is split into chunks once, every chunk runs through all of them in a worker, and the
+chunks are concatenated once at the end. Stages that need the whole frame (unique_keys,
+saving) break the chunking and run on the concatenated frame.
+
+Example:
+    result = pipeline.Pipeline([
+        pipeline.load(records.load_jsonl, inpt, field_defs),
+        pipeline.expand_multivalued(expansion_paths),
+        pipeline.apply_exclusion_list(exclusion_inpt, match_tuples),
+        pipeline.translate(translator),
+        pipeline.xref_integrity(["CODE"], df_codes, ["CODE"]),
+        pipeline.unique_keys(["ID", "ID_SUB"]),
+        pipeline.apply_mappings(mappings),
+        pipeline.save_csv(output),
+    ]).run()
+
+    result.df, result.failures, result.timings
+"""
+
+import time
+import collections
+
+import pandas
+
+from . import keyindex, parallel, records, validate
+
+import logging
+
+logger = logging.getLogger(f"{__package__}.pipeline")
+
+# Number of rows in each chunk of a fused run of row-local stages
+_DEFAULT_CHUNKSIZE = 50000
+
+PipelineResult = collections.namedtuple("PipelineResult", ["df", "failures", "timings"])
+PipelineResult.__doc__ = """The output of `Pipeline.run`. `failures` lists the failed
+records of every check stage in stage order, and `timings` lists `(stage name, seconds)`.
+The time of a fused stage is summed over its chunks, so it is worker time rather than
+wall time."""
+
+
+class Stage:
+    """A pipeline stage named `name`.
+
+    `func` takes a DataFrame and returns the resulting DataFrame, or the validation
+    failures if `check` is set, in which case the frame is passed on unchanged. A
+    `row_local` stage only looks at each row on its own, so it can run on chunks of the
+    frame. A `source` stage takes no input and produces the frame.
+
+    If `prepare` is given it's called once when the pipeline runs and returns the `func`
+    to use, e.g. to load lookup data once rather than once per chunk.
+    """
+
+    def __init__(
+        self, name, func=None, row_local=True, check=False, source=False, prepare=None
+    ):
+        self.name = name
+        self.func = func
+        self.row_local = row_local and not source
+        self.check = check
+        self.source = source
+        self.prepare = prepare
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+def stage(name, func, row_local=True):
+    """A stage running `func(df) -> df`"""
+    return Stage(name, func, row_local=row_local)
+
+
+def load(loader, inpt, *args, **kwargs):
+    """A source stage loading the frame with `loader(inpt, *args, **kwargs)`, e.g.
+    `records.load_jsonl`
+    """
+    return Stage("load", lambda df: loader(inpt, *args, **kwargs), source=True)
+
+
+def expand_multivalued(expansion_paths, **kwargs):
+    return Stage(
+        "expand_multivalued",
+        lambda df: records.expand_multivalued(df, expansion_paths, **kwargs),
+    )
+
+
+def apply_exclusion_list(f, match_tuples):
+    def _prepare():
+        # Load the exclusion list once rather than in every chunk
+        f_loaded = f
+        if not isinstance(f, (pandas.DataFrame, keyindex.KeyIndex)):
+            f_loaded = records.load_csv(f)
+
+        def _exclude(df):
+            records.apply_exclusion_list(df, f_loaded, match_tuples)
+            return df
+
+        return _exclude
+
+    return Stage("apply_exclusion_list", prepare=_prepare)
+
+
+def translate(translator):
+    def _translate(df):
+        translator.translate(df)
+        return df
+
+    return Stage("translate", _translate)
+
+
+def apply_mappings(mappings):
+    return Stage("apply_mappings", lambda df: records.apply_mappings(df, mappings))
+
+
+def xref_integrity(on_left, df_right, on_right, ignore_blanks=False):
+    """A check stage, see `validate.xref_integrity`. Each left-hand row is checked against
+    the whole of `df_right`, so the check runs on chunks of the left-hand frame.
+    """
+    return Stage(
+        "xref_integrity",
+        lambda df: validate.xref_integrity(
+            df, on_left, df_right, on_right, ignore_blanks=ignore_blanks
+        ),
+        check=True,
+    )
+
+
+def unique_keys(keys=None):
+    """A check stage, see `validate.unique_keys`. Needs the whole frame."""
+    return Stage(
+        "unique_keys",
+        lambda df: validate.unique_keys(df, keys),
+        row_local=False,
+        check=True,
+    )
+
+
+def save_csv(output, **kwargs):
+    def _save(df):
+        records.save_csv(output, df, **kwargs)
+        return df
+
+    return Stage("save_csv", _save, row_local=False)
+
+
+def save_jsonl(output, **kwargs):
+    def _save(df):
+        records.save_jsonl(output, df, **kwargs)
+        return df
+
+    return Stage("save_jsonl", _save, row_local=False)
+
+
+def _run_stages(stages, df):
+    """Run `stages`, a list of `(Stage, func)`, on `df`. Returns the resulting frame, the
+    failures of each stage and the time each stage took.
+    """
+    failures = []
+    seconds = []
+    for stage, func in stages:
+        start = time.perf_counter()
+        if stage.check:
+            failures.append(list(func(df)))
+        else:
+            failures.append([])
+            df = func(df)
+        seconds.append(time.perf_counter() - start)
+    return df, failures, seconds
+
+
+class Pipeline:
+    """Runs a list of `Stage`s, fusing consecutive row-local stages into one pass over
+    chunks of `chunksize` rows, which are run in parallel on `pool`. The default pool is
+    a pathos ProcessPool, since several of the stages use thread pools of their own.
+    """
+
+    def __init__(self, stages, chunksize=_DEFAULT_CHUNKSIZE, pool=None):
+        self.stages = list(stages)
+        self.chunksize = chunksize
+        self.pool = pool
+
+    def _get_pool(self):
+        if self.pool is None:
+            self.pool = parallel._make_pool("process")
+        return self.pool
+
+    def segments(self):
+        """Return the stages grouped into the segments they're run in. Consecutive
+        row-local stages share a segment, every other stage is a segment of its own.
+        """
+        segments = []
+        for stage in self.stages:
+            if stage.row_local and segments and segments[-1][-1].row_local:
+                segments[-1].append(stage)
+            else:
+                segments.append([stage])
+        return segments
+
+    def run(self, df=None):
+        """Run the pipeline on `df`, or on the frame produced by its first stage if that
+        is a `source` stage. Returns a `PipelineResult`.
+        """
+        funcs = {
+            id(stage): stage.prepare() if stage.prepare is not None else stage.func
+            for stage in self.stages
+        }
+
+        failures = []
+        timings = []
+        for segment in self.segments():
+            stages = [(stage, funcs[id(stage)]) for stage in segment]
+
+            if segment[0].source:
+                start = time.perf_counter()
+                df = stages[0][1](None)
+                seconds = [time.perf_counter() - start]
+                stage_failures = [[]]
+            elif segment[0].row_local:
+                df, stage_failures, seconds = self._run_fused(stages, df)
+            else:
+                df, stage_failures, seconds = _run_stages(stages, df)
+
+            for stage, stage_seconds in zip(segment, seconds):
+                logger.info(f"Pipeline stage {stage.name} took {stage_seconds:.3f}s")
+                timings.append((stage.name, stage_seconds))
+            for failed in stage_failures:
+                failures.extend(failed)
+
+        return PipelineResult(df, failures, timings)
+
+    def _run_fused(self, stages, df):
+        n_rows = df.shape[0]
+        chunks = [
+            df.iloc[start : start + self.chunksize].copy()
+            for start in range(0, n_rows, self.chunksize)
+        ] or [df.copy()]
+
+        logger.info(
+            f"Running stages {[stage.name for stage, func in stages]} on "
+            f"{len(chunks)} chunks"
+        )
+        results = self._get_pool().map(lambda chunk: _run_stages(stages, chunk), chunks)
+
+        df = pandas.concat([result[0] for result in results], ignore_index=True)
+        failures = [
+            [failed for result in results for failed in result[1][stage_i]]
+            for stage_i in range(len(stages))
+        ]
+        seconds = [
+            sum(result[2][stage_i] for result in results)
+            for stage_i in range(len(stages))
+        ]
+        return df, failures, seconds
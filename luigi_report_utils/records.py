@@ -1,17 +1,66 @@
+import os
+import re
 import csv
+import codecs
+import glob
 import json
+import tempfile
+import threading
 import itertools
+import contextlib
+import collections
 
+import numpy
 import pandas
 
 from collections.abc import Iterable
 
-from . import parallel
+from . import keyindex, memory, parallel, partitioned, sortedmerge, transforms
+from .inpt import _chmod_default, from_path
 
 import logging
 
 logger = logging.getLogger(f"{__package__}.records")
 
+# Pass as `string_dtype` to the loaders to store string columns as Arrow backed arrays.
+# Requires pyarrow to be installed.
+ARROW_STRING_DTYPE = "string[pyarrow]"
+
+# Number of rows serialized at a time by save_csv and save_jsonl
+_SAVE_CHUNKSIZE = 100000
+
+# Size in bytes of the write buffer used by save_csv and save_jsonl
+_SAVE_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Default number of distinct values kept by a SchemaField(intern=True) value table
+_INTERN_MAX_SIZE = 65536
+
+# Number of values sampled by SchemaField(intern="auto") before deciding whether to keep
+# interning, and the largest fraction of distinct values in the sample it keeps going for.
+_INTERN_SAMPLE_SIZE = 1000
+_INTERN_MAX_DISTINCT = 0.5
+
+# Default number of values cached by a SchemaField(memoize=True) transform
+_MEMOIZE_MAX_SIZE = 65536
+
+# Number of rows sampled by `infer_field_defs` to propose column types
+_INFER_SAMPLE_SIZE = 1000
+
+# Columns are inferred as categorical when the sample has at least
+# `_INFER_MIN_CATEGORY_ROWS` values and at most `_INFER_MAX_CATEGORY_RATIO` of them
+# are distinct.
+_INFER_MIN_CATEGORY_ROWS = 10
+_INFER_MAX_CATEGORY_RATIO = 0.5
+
+# Values with a "+" sign or leading zeros aren't inferred as numbers, so that e.g. an
+# identifier like "00123" doesn't lose its zeros. Ints must also convert back to the same
+# string, see `_is_int`.
+_INT_RE = re.compile(r"-?\d+")
+_FLOAT_RE = re.compile(r"-?((0|[1-9]\d*)(\.\d*)?|\.\d+)([eE][+-]?\d+)?")
+_DATETIME_RE = re.compile(
+    r"\d{4}-\d{1,2}-\d{1,2}([ T].*)?|\d{1,2}/\d{1,2}/\d{2,4}( .*)?"
+)
+
 # https://github.com/pandas-dev/pandas/blob/b9b081dc6b510c8290ded12fe751b1216843527e/pandas/core/common.py#L286
 def _maybe_make_list(obj):
     if obj is not None and not isinstance(obj, (tuple, list)):
@@ -19,21 +68,211 @@ def _maybe_make_list(obj):
     return list(obj)
 
 class SchemaField:
+    """Describes how `load_records` should build a single column.
+
+    `transform` is a callable (or list of callables) applied to each value as it is loaded.
+    `vector_transform` is a callable (or list of callables) applied to the whole column as a
+    `pandas.Series` once the DataFrame is built, see the `transforms` module. When a
+    `vector_transform` is given the scalar `transform` is not run.
+
+    `intern` deduplicates equal string values through a table as they are loaded, so
+    repeated values (codes, flags, ...) share one object. Pass `True` for a table of up to
+    `_INTERN_MAX_SIZE` values, an int for a different bound, or "auto" to only keep
+    interning if the first values loaded turn out to be low-cardinality.
+
+    `memoize` caches the result of `transform` for each distinct input value, so expensive
+    transforms (date parsing, `flatten_mv`, ...) run once per value. Pass `True` for a cache
+    of up to `_MEMOIZE_MAX_SIZE` values or an int for a different bound. Lists and
+    dictionaries are frozen to build the cache key. Cached results are shared between
+    records, so transforms should not return values that are changed afterwards. The cache
+    is kept on the field across loads, see `memo_info`.
+    """
+
     def __init__(
-        self, name, type=None, transform=None, filter_none=False, none_value="",
+        self,
+        name,
+        type=None,
+        transform=None,
+        filter_none=False,
+        none_value="",
+        vector_transform=None,
+        intern=False,
+        memoize=False,
     ):
         self.name = name
         self.type = type
         self.filter_none = filter_none
         self.transform = transform
         self.none_value = none_value
+        self.vector_transform = vector_transform
+        self.intern = intern
+        self._memo = None
+        if memoize is True:
+            self._memo = _Memo(_MEMOIZE_MAX_SIZE)
+        elif memoize:
+            self._memo = _Memo(memoize)
+
+    def __repr__(self):
+        args = [repr(self.name)]
+        defaults = (
+            ("type", None),
+            ("transform", None),
+            ("filter_none", False),
+            ("none_value", ""),
+            ("vector_transform", None),
+            ("intern", False),
+        )
+        for attr, default in defaults:
+            value = getattr(self, attr)
+            if value is default or (value == default and type(value) is type(default)):
+                continue
+            if attr in ("transform", "vector_transform"):
+                value_repr = _callables_repr(value)
+            else:
+                value_repr = repr(value)
+            args.append(f"{attr}={value_repr}")
+        if self._memo is not None:
+            args.append(f"memoize={self._memo.max_size}")
+        return f"SchemaField({', '.join(args)})"
+
+    def memo_info(self):
+        """Return the `MemoInfo` of the field's transform cache, or None if the field
+        isn't memoized
+        """
+        return None if self._memo is None else self._memo.info()
+
+    def _apply_transform(self, value):
+        for f in _maybe_make_list(self.transform):
+            value = f(value)
+        return value
+
+
+def _callable_repr(f):
+    """Return how `f` would be referred to in code, e.g. "transforms.blank_to_none" """
+    module = getattr(f, "__module__", None)
+    qualname = getattr(f, "__qualname__", None)
+    if module is None or qualname is None or "<" in qualname:
+        return repr(f)
+    if module == "builtins":
+        return qualname
+    if module.startswith(f"{__package__}."):
+        module = module[len(__package__) + 1 :]
+    return f"{module}.{qualname}"
+
+
+def _callables_repr(value):
+    if isinstance(value, (tuple, list)):
+        return f"[{', '.join(_callable_repr(f) for f in value)}]"
+    return _callable_repr(value)
+
+
+MemoInfo = collections.namedtuple("MemoInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def _freeze(value):
+    """Return a hashable key for `value`, including its type so that e.g. 1 and True
+    don't share a key. Raises TypeError for values that can't be frozen.
+    """
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze(item) for item in value))
+    if isinstance(value, dict):
+        return (
+            type(value),
+            frozenset((key, _freeze(item)) for key, item in value.items()),
+        )
+    hash(value)
+    return (type(value), value)
+
+
+class _Memo:
+    """A bounded LRU cache of transform results, keyed by the frozen input value"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # The cache and its lock stay in the process that built them
+        return {"max_size": self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_size"])
+
+    def info(self):
+        return MemoInfo(self.hits, self.misses, self.max_size, len(self._cache))
+
+    def __call__(self, value, compute):
+        try:
+            key = _freeze(value)
+        except TypeError:
+            self.misses += 1
+            return compute(value)
+
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        result = compute(value)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = result
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return result
+
+
+class _Interner:
+    """Returns a shared instance for each distinct string value passed to it, keeping up to
+    `max_size` values. If `auto` is set it stops interning once a sample of the values
+    shows they are mostly distinct.
+    """
+
+    def __init__(self, max_size=_INTERN_MAX_SIZE, auto=False):
+        self.max_size = max_size
+        self.sampling = auto
+        self.seen = 0
+        self.table = {}
+
+    @classmethod
+    def for_field(cls, field_def):
+        if field_def.intern is False or field_def.intern is None:
+            return None
+        if field_def.intern == "auto":
+            return cls(auto=True)
+        if field_def.intern is True:
+            return cls()
+        return cls(max_size=field_def.intern)
+
+    def __call__(self, value):
+        if self.table is None or not isinstance(value, str):
+            return value
+
+        interned = self.table.get(value)
+        if interned is None:
+            interned = value
+            if len(self.table) < self.max_size:
+                self.table[value] = value
+
+        if self.sampling:
+            self.seen += 1
+            if self.seen >= _INTERN_SAMPLE_SIZE:
+                self.sampling = False
+                if len(self.table) > self.seen * _INTERN_MAX_DISTINCT:
+                    self.table = None
+
+        return interned
 
 
 def flatten_mv(value):
     """A field transform helper for use with SchemaField(transform=...)
     Takes a structured input value and repeatedly flattens single-valued lists, and dictionaries
     and returns the final value. Will raise a ValueError if it encounters a list or dictionary
-    with more than one value.
+    that doesn't contain exactly one value. The input value is not modified.
 
     Example:
         before:
@@ -51,42 +290,222 @@ def flatten_mv(value):
     while True:
         # If the value is a list, assert there is only one item in the list
         if isinstance(value, list):
-            if len(value) > 1:
+            if len(value) != 1:
                 raise ValueError(f"Cannot flatten list: {value}")
-            value = value.pop(0)
+            value = value[0]
 
         # If the value is a dict, assert there is only one item in the dict
         elif isinstance(value, dict):
-            if len(value) > 1:
+            if len(value) != 1:
                 raise ValueError(f"Cannot flatten dictionary: {value}")
-            _, value = value.popitem()
+            (value,) = value.values()
 
         else:
             break
     return value
 
 
-def load_records(records, field_defs, index=None, pool=None):
+class FlattenError(ValueError):
+    """Raised by `flatten_mv_column` with every value that couldn't be flattened.
+    `failures` is a list of `(index, value)` tuples.
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+        preview = ", ".join(f"{i!r}: {v!r}" for i, v in failures[:5])
+        more = f" (and {len(failures) - 5} more)" if len(failures) > 5 else ""
+        super().__init__(f"Cannot flatten {len(failures)} values: {preview}{more}")
+
+
+def flatten_mv_column(values, errors="raise"):
+    """A vectorized version of `flatten_mv` for use with SchemaField(vector_transform=...)
+    Flattens every value in the `values` Series and returns a new Series, the input is not
+    modified. Values that are already scalar are passed through untouched.
+
+    Values that can't be flattened are collected, and then depending on `errors`:
+      "raise":  raise a FlattenError listing all of them
+      "coerce": replace them with None
+      "ignore": leave them as they are
+    """
+    if errors not in ("raise", "coerce", "ignore"):
+        raise ValueError(f"invalid value for errors: {errors!r}")
+
+    # Fast path: nothing to do if none of the values are nested
+    nested = values.map(lambda v: isinstance(v, (list, dict))).astype(bool)
+    if not nested.any():
+        return values
+
+    flat_values = []
+    failures = []
+    for i, value in values[nested].items():
+        try:
+            value = flatten_mv(value)
+        except ValueError:
+            failures.append((i, value))
+            if errors == "coerce":
+                value = None
+        flat_values.append(value)
+
+    if failures and errors == "raise":
+        raise FlattenError(failures)
+
+    result = values.copy()
+    result[nested] = pandas.Series(flat_values, index=result.index[nested], dtype=object)
+    return result
+
+
+def _project_fields(field_defs, usecols):
+    """Return the field_defs that are needed to produce the columns in `usecols`. Fields
+    with `filter_none` are kept since they still decide which records are loaded.
+    """
+    usecols = set(usecols)
+    return [
+        field_def
+        for field_def in field_defs
+        if field_def.name in usecols or field_def.filter_none is True
+    ]
+
+
+def _is_null(value):
+    return value is None or value == ""
+
+
+def _is_member(value, arg):
+    try:
+        return value in arg
+    except TypeError:
+        # An unhashable value, e.g. a raw multi-valued field, isn't in a frozenset
+        return False
+
+
+_WHERE_OPS = {
+    "==": lambda value, arg: value == arg,
+    "!=": lambda value, arg: value != arg,
+    "in": lambda value, arg: _is_member(value, arg),
+    "not in": lambda value, arg: not _is_member(value, arg),
+    "startswith": lambda value, arg: isinstance(value, str) and value.startswith(arg),
+    "isnull": lambda value, arg: _is_null(value),
+    "notnull": lambda value, arg: not _is_null(value),
+}
+
+
+def _compile_where(where):
+    """Return a list of `(field, test, arg)` for the predicates in `where`, see
+    `load_records`
+    """
+    predicates = []
+    for predicate in where:
+        if len(predicate) == 2:
+            (field, op), arg = predicate, None
+        else:
+            field, op, arg = predicate
+
+        if op not in _WHERE_OPS:
+            raise ValueError(
+                f"unknown where operator {op!r}, expected one of {list(_WHERE_OPS)}"
+            )
+        if op in ("in", "not in"):
+            try:
+                arg = frozenset(arg)
+            except TypeError:
+                pass
+        predicates.append((field, _WHERE_OPS[op], arg))
+    return predicates
+
+
+def _where_fields(where):
+    """Return the names of the raw fields tested by the `where` predicates"""
+    return [predicate[0] for predicate in where or ()]
+
+
+def load_records(
+    records,
+    field_defs,
+    index=None,
+    pool=None,
+    usecols=None,
+    string_dtype=None,
+    memory_limit=None,
+    where=None,
+    lazy=False,
+):
     """ Given an iterator of dictionary records and a list of field deffinitions,
     will return a DataFrame.
+
+    If `usecols` is given, only the fields named in it are loaded and any other field
+    deffinitions are skipped entirely, see `mapping_columns`.
+
+    If `string_dtype` is given (e.g. `ARROW_STRING_DTYPE`) it is used for fields with
+    type "str", and for untyped fields that only contain strings.
+
+    If `memory_limit` is given (bytes, or a string like "512MB") the records are loaded in
+    chunks sized to the limit, and loaded chunks are spilled to disk once holding them
+    would exceed it, see `memory.build_chunked`. The chunks are then concatenated, so the
+    loaded frame still has to fit in memory, unless `lazy` is also set. A
+    `memory.ChunkSpiller` of the chunks is returned then, which loads them one at a time
+    when iterated or passed to `save_csv` or `save_jsonl`.
+
+    If `where` is given, only records matching all of its predicates are loaded. They are
+    tested against the raw record values, before any transform, as tuples of:
+        (field, "==", value)         (field, "!=", value)
+        (field, "in", values)        (field, "not in", values)
+        (field, "startswith", prefix)
+        (field, "isnull")            (field, "notnull")
+    where null values are None or the empty string.
     """
 
+    if memory_limit is not None:
+        return memory.build_chunked(
+            lambda chunk: load_records(
+                chunk,
+                field_defs,
+                index=index,
+                usecols=usecols,
+                string_dtype=string_dtype,
+                where=where,
+            ),
+            records,
+            memory_limit,
+            ignore_index=index is None,
+            lazy=lazy,
+        )
+
+    if usecols is not None:
+        field_defs = _project_fields(field_defs, usecols)
+
     columns = [field.name for field in field_defs]
 
     blank_record = [None] * len(field_defs)
 
+    interners = [_Interner.for_field(field_def) for field_def in field_defs]
+
+    predicates = _compile_where(where) if where else []
+    filtered = [0]
+
     def _process_record(src):
+        for field, test, arg in predicates:
+            if not test(src.get(field, None), arg):
+                filtered[0] += 1
+                return
+
         record = blank_record.copy()
 
-        field_i = 0
-        for field_def in field_defs:
+        for field_i, field_def in enumerate(field_defs):
             # Retrieve the field from the record, set to None if
             # the field doesn't exist.
             value = src.get(field_def.name, None)
 
+            # Vectorized fields are transformed, filtered and defaulted column-wise
+            # once the DataFrame has been built.
+            if field_def.vector_transform is not None:
+                record[field_i] = value
+                continue
+
             if field_def.transform is not None:
-                for f in _maybe_make_list(field_def.transform):
-                    value = f(value)
+                if field_def._memo is not None:
+                    value = field_def._memo(value, field_def._apply_transform)
+                else:
+                    value = field_def._apply_transform(value)
 
             if field_def.filter_none is True and value is None:
                 return
@@ -94,8 +513,10 @@ def load_records(records, field_defs, index=None, pool=None):
             if field_def.none_value is not None and value is None:
                 value = field_def.none_value
 
+            if interners[field_i] is not None:
+                value = interners[field_i](value)
+
             record[field_i] = value
-            field_i += 1
 
         return record
 
@@ -106,63 +527,392 @@ def load_records(records, field_defs, index=None, pool=None):
     # Construct DataFrame from records
     df = pandas.DataFrame.from_records(records, index=index, columns=columns)
 
+    if predicates:
+        logger.info(f"Filtered out {filtered[0]} records not matching {where}")
+
+    # Apply any vectorized transforms to their whole column
+    keep = None
+    for field_def in field_defs:
+        if field_def.vector_transform is None:
+            continue
+
+        values = df[field_def.name]
+        for f in _maybe_make_list(field_def.vector_transform):
+            values = f(values)
+
+        missing = values.isna()
+        if field_def.filter_none is True:
+            keep = ~missing if keep is None else keep & ~missing
+        elif field_def.none_value is not None and missing.any():
+            values = values.where(~missing, field_def.none_value)
+
+        df[field_def.name] = values
+
+    if keep is not None:
+        df = df.loc[keep]
+        df = df.reset_index(drop=True) if index is None else df.copy()
+
     # Set the DataFrame column types if they were provided
     for field_def in field_defs:
-        if field_def.type is not None:
-            df[field_def.name] = df[field_def.name].astype(field_def.type)
+        col_type = field_def.type
+        if string_dtype is not None:
+            if col_type in ("str", str) or (
+                col_type is None
+                and pandas.api.types.infer_dtype(df[field_def.name]) == "string"
+            ):
+                col_type = string_dtype
+
+        if col_type is not None:
+            df[field_def.name] = df[field_def.name].astype(col_type)
+
+    # Drop the fields that were only loaded to filter records
+    if usecols is not None:
+        unused = [col for col in df.columns if col not in usecols]
+        if unused:
+            df = df.drop(columns=unused)
 
     return df
 
 
-def load_csv(inpt, field_defs=None, **kwargs):
+def _read_csv_columns(reader, fieldnames, columns):
+    """Yield dictionary records containing only `columns` from the rows of a csv.reader"""
+    positions = [(name, fieldnames.index(name)) for name in columns if name in fieldnames]
+    for row in reader:
+        # Skip blank rows the same way csv.DictReader does
+        if row == []:
+            continue
+        yield {name: row[i] if i < len(row) else None for name, i in positions}
+
+
+def load_csv(
+    inpt,
+    field_defs=None,
+    usecols=None,
+    partition_size=None,
+    infer_types=False,
+    **kwargs,
+):
+    """Load a csv file into a DataFrame. If `partition_size` is given the rows are loaded
+    in parallel and a `partitioned.PartitionedFrame` is returned.
+
+    Without `field_defs` every column is loaded as a string. If `infer_types` is set the
+    column types are inferred instead, see `infer_field_defs`, and the inferred field
+    deffinitions are logged so they can be pinned in code.
+    """
+    if infer_types and field_defs is not None:
+        raise ValueError("infer_types can only be used without field_defs")
+
+    if partition_size is not None:
+        if infer_types:
+            raise ValueError("infer_types isn't supported with partition_size")
+        return partitioned.load_csv(
+            inpt, field_defs, partition_size, usecols=usecols, **kwargs
+        )
+
     logger.info(f"Loading records from {inpt}")
 
     csv.register_dialect("strict", strict=True)
 
     with inpt.open("r") as input_file:
-        r = csv.DictReader(input_file, dialect="strict")
+        if usecols is None:
+            r = csv.DictReader(input_file, dialect="strict")
+            fieldnames = r.fieldnames
+        else:
+            r = csv.reader(input_file, dialect="strict")
+            fieldnames = next(r, [])
 
         # generate a default list of field_defs with all columns if we weren't given one
         if field_defs is None:
             field_defs = [
-                SchemaField(fieldname, type="str") for fieldname in r.fieldnames
+                SchemaField(fieldname, type="str") for fieldname in fieldnames
+            ]
+
+        if usecols is not None:
+            # Only split out the columns that are needed
+            field_defs = _project_fields(field_defs, usecols)
+            columns = [field_def.name for field_def in field_defs]
+            # The raw values tested by `where` are needed even if they aren't loaded
+            columns += [
+                name for name in _where_fields(kwargs.get("where")) if name not in columns
             ]
+            r = _read_csv_columns(r, fieldnames, columns)
 
-        df = load_records(r, field_defs, **kwargs)
+        df = load_records(r, field_defs, usecols=usecols, **kwargs)
+
+    if infer_types:
+        df, field_defs = infer_field_defs(df)
+        logger.info(f"Inferred field_defs for {inpt}: {field_defs!r}")
 
     logger.info(f"Loaded {df.shape[0]} records from {inpt}")
     return df
 
 
-def save_csv(output, df):
+def _propose_type(sample):
+    """Propose a type for a column from a sample of its non-blank string values. Returns
+    one of "int", "float", "datetime", "category" or "str".
+    """
+    if not sample:
+        return "str"
+    if all(_is_int(value) for value in sample):
+        return "int"
+    if all(_FLOAT_RE.fullmatch(value) for value in sample):
+        return "float"
+    if all(_DATETIME_RE.fullmatch(value) for value in sample):
+        try:
+            pandas.to_datetime(pandas.Series(sample), errors="raise")
+            return "datetime"
+        except (ValueError, TypeError, OverflowError):
+            pass
+    if (
+        len(sample) >= _INFER_MIN_CATEGORY_ROWS
+        and len(set(sample)) <= len(sample) * _INFER_MAX_CATEGORY_RATIO
+    ):
+        return "category"
+    return "str"
+
+
+def _is_int(value):
+    """Whether the string `value` is an int that converts back to the same string"""
+    return bool(_INT_RE.fullmatch(value)) and str(int(value)) == value
+
+
+def _int_type(values, nullable):
+    """Return the smallest integer type that holds all the int `values`"""
+    low, high = (min(values), max(values)) if len(values) else (0, 0)
+    for bits in (8, 16, 32, 64):
+        info = numpy.iinfo(f"int{bits}")
+        if info.min <= low and high <= info.max:
+            return f"Int{bits}" if nullable else f"int{bits}"
+    raise OverflowError(f"values don't fit in 64 bits: {low}, {high}")
+
+
+def _convert_column(values, kind):
+    """Convert a column of strings to `kind`, see `_propose_type`. Returns the
+    converted column and its type. Raises ValueError, TypeError or OverflowError if a
+    value can't be converted.
+    """
+    if kind == "category":
+        return values.astype("category"), "category"
+
+    blank = values.isna() | values.eq("")
+    values = values.where(~blank, None)
+
+    if kind in ("int", "float"):
+        is_number = _is_int if kind == "int" else _FLOAT_RE.fullmatch
+        for value in values[~blank]:
+            if not is_number(value):
+                raise ValueError(f"{value!r} isn't an unambiguous {kind}")
+
+    if kind == "int":
+        col_type = _int_type(values[~blank].map(int).tolist(), blank.any())
+    elif kind == "float":
+        floats = values.astype("float64")
+        narrowed = floats.astype("float32").astype("float64")
+        exact = narrowed.eq(floats) | floats.isna()
+        col_type = "float32" if exact.all() else "float64"
+    else:
+        col_type = "datetime64[ns]"
+
+    return values.astype(col_type), col_type
+
+
+def infer_field_defs(df, sample_size=_INFER_SAMPLE_SIZE):
+    """Infer column types for a DataFrame of strings, e.g. as loaded by `load_csv`.
+
+    Types are proposed from the first `sample_size` rows: integers get the smallest
+    width that holds the whole column (nullable if it has blanks), floats are float32
+    where that is exact, and there are datetimes and low-cardinality categoricals. Each
+    column is then converted in full, and kept as strings if any value doesn't convert.
+
+    Returns the converted DataFrame and the list of SchemaFields that loads the same
+    types, which can be copied from its repr to pin the schema in code.
+    """
+    df = df.copy()
+    field_defs = []
+
+    for name in df.columns:
+        values = df[name]
+        sample = [
+            value
+            for value in values.iloc[:sample_size]
+            if value is not None and value != ""
+        ]
+        kind = _propose_type(sample)
+
+        col_type = "str"
+        if kind != "str":
+            try:
+                converted, col_type = _convert_column(values, kind)
+                df[name] = converted
+            except (ValueError, TypeError, OverflowError) as e:
+                logger.warning(
+                    f"Column {name} doesn't match the {kind} type inferred from the "
+                    f"first {sample_size} rows, keeping strings: {e}"
+                )
+                col_type = "str"
+
+        if kind in ("int", "float", "datetime") and col_type != "str" and (
+            values.isna() | values.eq("")
+        ).any():
+            # Blank strings become missing values when the schema is used with load_csv
+            field_defs.append(
+                SchemaField(
+                    name,
+                    type=col_type,
+                    none_value=None,
+                    vector_transform=transforms.blank_to_none,
+                )
+            )
+        else:
+            field_defs.append(SchemaField(name, type=col_type))
+
+    return df, field_defs
+
+
+@contextlib.contextmanager
+def _open_output(output, buffer_size=_SAVE_BUFFER_SIZE):
+    """Open `output` for writing text. Local paths, and luigi.LocalTargets using the
+    default format, are written to a temporary file in the same directory, with a large
+    write buffer, which is atomically renamed onto the path once writing succeeds. Any
+    other target (remote targets, targets with a format such as Gzip) is opened with
+    `output.open("w")`, which luigi makes atomic.
+    """
+    if isinstance(output, (str, os.PathLike)):
+        path = output
+    else:
+        import luigi
+        import luigi.format
+
+        if not (
+            isinstance(output, luigi.LocalTarget)
+            and output.format is luigi.format.get_default_format()
+        ):
+            with output.open("w") as f:
+                # Binary formats such as luigi.format.Gzip take bytes
+                if "b" in getattr(f, "mode", ""):
+                    f = codecs.getwriter("utf-8")(f)
+                yield f
+            return
+        path = output.path
+
+    path = os.fspath(path)
+    dirname = os.path.dirname(os.path.abspath(path))
+    os.makedirs(dirname, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=dirname, prefix=os.path.basename(path) + "-tmp-")
+    try:
+        with open(fd, "w", buffering=buffer_size, encoding="utf-8", newline="") as f:
+            yield f
+        _chmod_default(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _write_chunked(f, df, serialize, chunksize, pool):
+    """Serialize `df` in blocks of `chunksize` rows using `serialize(block, is_first)` and
+    write them to `f` in order. If a `pool` is given the blocks are serialized in parallel.
+    `df` may also be a `memory.ChunkSpiller`, whose chunks are loaded and written one at a
+    time.
+    """
+    if chunksize is None:
+        chunksize = _SAVE_CHUNKSIZE
+
+    frames = df if isinstance(df, memory.ChunkSpiller) else [df]
+    for frame_i, frame in enumerate(frames):
+        starts = range(0, frame.shape[0], chunksize) if frame.shape[0] > 0 else [0]
+
+        def _serialize(start):
+            block = frame.iloc[start : start + chunksize]
+            return serialize(block, frame_i == 0 and start == 0)
+
+        if pool is None:
+            chunks = map(_serialize, starts)
+        else:
+            chunks = pool.imap(_serialize, starts)
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def save_csv(output, df, chunksize=None, pool=None):
+    """Write `df` to `output` as csv, `chunksize` rows at a time.
+    See `_open_output` for how `output` is written atomically.
+    """
     logger.info(f"Outputing {df.shape[0]} records to {output}")
-    with output.open("w") as f:
-        ret = df.to_csv(f, index=False)
-        logger.info("Output completed.")
-        return ret
 
+    def _serialize(block, is_first):
+        return block.to_csv(index=False, header=is_first)
+
+    with _open_output(output) as f:
+        _write_chunked(f, df, _serialize, chunksize, pool)
+    logger.info("Output completed.")
+
+
+def load_jsonl(inpt, field_defs, usecols=None, partition_size=None, **kwargs):
+    """Load a json lines file into a DataFrame. If `partition_size` is given the records
+    are loaded in parallel and a `partitioned.PartitionedFrame` is returned.
+    """
+    if partition_size is not None:
+        return partitioned.load_jsonl(
+            inpt, field_defs, partition_size, usecols=usecols, **kwargs
+        )
 
-def load_jsonl(inpt, field_defs, **kwargs):
     logger.info(f"Loading records from {inpt}")
 
     with inpt.open("r") as input_file:
         raw_records = map(json.loads, input_file)
-        df = load_records(raw_records, field_defs, **kwargs)
+        df = load_records(raw_records, field_defs, usecols=usecols, **kwargs)
 
     logger.info(f"Loaded {df.shape[0]} records from {inpt}")
     return df
 
 
-def save_jsonl(output, df):
+def load_many(
+    inputs, field_defs=None, loader=None, kind="thread", pool=None, n_cpus=None, **kwargs
+):
+    """Load several inputs concurrently with `loader` (`load_jsonl` by default) and return
+    them as one DataFrame, in input order.
+
+    `inputs` is a list of inpt objects or paths, or a glob pattern which is expanded in
+    sorted order. The inputs are loaded on a thread pool when `kind` is "thread", suited to
+    I/O bound loads, or on a process pool when it is "process", suited to parse bound
+    loads. Any other keyword arguments are passed on to `loader`.
+    """
+    if isinstance(inputs, str):
+        inputs = sorted(glob.glob(inputs))
+    inputs = [from_path(i) if isinstance(i, str) else i for i in inputs]
+    if not inputs:
+        raise ValueError("no inputs to load")
+
+    if loader is None:
+        loader = load_jsonl
+
+    if pool is None:
+        pool = parallel._make_pool(kind, n_cpus, max_nodes=len(inputs))
+
+    frames = pool.map(lambda i: loader(i, field_defs, **kwargs), inputs)
+
+    logger.info(f"Loaded {len(frames)} inputs, concatenating")
+    return pandas.concat(frames, ignore_index="index" not in kwargs)
+
+
+def save_jsonl(output, df, chunksize=None, pool=None):
+    """Write `df` to `output` as json lines, `chunksize` rows at a time.
+    See `_open_output` for how `output` is written atomically.
+    """
     logger.info(f"Outputing {df.shape[0]} records to {output}")
 
-    ret = df.to_json(output, orient="records", lines=True)
+    def _serialize(block, is_first):
+        text = block.to_json(orient="records", lines=True)
+        # Older versions of pandas don't terminate the last line
+        return text if text.endswith("\n") else text + "\n"
 
+    with _open_output(output) as f:
+        _write_chunked(f, df, _serialize, chunksize, pool)
     logger.info("Output completed.")
-    return ret
 
 
-def apply_exclusion_list(df, f, match_tuples):
+def apply_exclusion_list(df, f, match_tuples, assume_sorted=False):
     """ Given a DataFrame, an exclusion list input file, and a list of tuples containing column xrefs,
     will iterate through each record in the DataFrame excluding any record where the columns specified
     in the match_tuples correspond to a row in the exclusion list.
@@ -172,7 +922,26 @@ def apply_exclusion_list(df, f, match_tuples):
         ('key1', 'exclusion_key1'),
         ('key2', 'exclusion_key2'),
       )
+
+    The exclusion list may also be a `keyindex.KeyIndex` built from its key columns.
+
+    If `assume_sorted` is True both the DataFrame and the exclusion list must be sorted on
+    their match columns, and they are compared with a single linear merge. A
+    `sortedmerge.SortOrderError` is raised if they aren't sorted.
     """
+    if isinstance(df, partitioned.PartitionedFrame):
+        return partitioned.apply_exclusion_list(df, f, match_tuples)
+
+    if isinstance(f, keyindex.KeyIndex):
+        # Look the keys up in the index rather than loading the exclusion list
+        cols = f.left_columns(
+            [match_tuple[0] for match_tuple in match_tuples],
+            [match_tuple[1] for match_tuple in match_tuples],
+        )
+        excluded = f.contains(df, cols)
+        df.drop(index=df.index[excluded], inplace=True)
+        return
+
     df_exclude = None
     if isinstance(f, pandas.DataFrame):
         # use the DataFrame we were given
@@ -196,6 +965,16 @@ def apply_exclusion_list(df, f, match_tuples):
                 )
             )
 
+    if assume_sorted:
+        excluded = sortedmerge.membership(
+            sortedmerge.frame_keys(df, [match_tuple[0] for match_tuple in match_tuples]),
+            sortedmerge.frame_keys(
+                df_exclude, [match_tuple[1] for match_tuple in match_tuples]
+            ),
+        )
+        df.drop(index=df.index[list(excluded)], inplace=True)
+        return
+
     # Create an index to hold references to the rows we want to drop
     drop_i = pandas.Int64Index([])
 
@@ -213,7 +992,9 @@ def apply_exclusion_list(df, f, match_tuples):
 
 
 
-def expand_multivalued(df, expansion_paths, drop_mv=True):
+def expand_multivalued(
+    df, expansion_paths, drop_mv=True, memory_limit=None, mode="aligned", lazy=False
+):
     """
     Given a DataFrame like the following:
       ID 	ID_SUB_MV
@@ -237,71 +1018,166 @@ def expand_multivalued(df, expansion_paths, drop_mv=True):
       2     '0'     '0'
       2     '1'     '1'
       2     '2'     '2'
-    """
 
-    # Create new blank columns to expand values into
-    new_columns = {new_col: None for new_col, path in expansion_paths.items()}
-    df = df.assign(**new_columns)
+    A path may contain several None wildcards to flatten nested multi-valued structures
+    in one pass, e.g. ('ID_SUB_MV', None, 'VAL_MS', None, 'VAL'). Paths are aligned by
+    position at each wildcard level, and a path with fewer wildcards repeats its value for
+    the rows nested below it, see `_expand_aligned`. With `mode="product"` the paths of
+    each source column are aligned with each other and the source columns are crossed,
+    giving a row for each combination of their items.
+
+    If `memory_limit` is given the rows are expanded in chunks sized to the limit, and
+    `lazy` returns the chunks as a `memory.ChunkSpiller`, see `load_records`.
+    """
+    if isinstance(df, partitioned.PartitionedFrame):
+        return partitioned.expand_multivalued(
+            df, expansion_paths, drop_mv=drop_mv, mode=mode
+        )
+
+    if memory_limit is not None:
+        return memory.build_chunked(
+            lambda rows: expand_multivalued(
+                df.iloc[rows[0] : rows[-1] + 1] if rows else df.iloc[:0],
+                expansion_paths,
+                drop_mv=drop_mv,
+                mode=mode,
+            ),
+            range(df.shape[0]),
+            memory_limit,
+            lazy=lazy,
+        )
+
+    if mode not in ("aligned", "product"):
+        raise ValueError(f"mode must be 'aligned' or 'product', not {mode!r}")
+
+    for path in expansion_paths.values():
+        if None not in path[1:]:
+            raise KeyError("key path must contain a None value to use as a wildcard")
 
     # Custruct list of column names that will be in the output DataFrame
-    target_columns = list(df.columns)
+    target_columns = list(df.columns) + [
+        col for col in expansion_paths if col not in df.columns
+    ]
     if drop_mv:
         for path in expansion_paths.values():
-            if path[0] in target_columns:
+            if path[0] in target_columns and path[0] not in expansion_paths:
                 target_columns.remove(path[0])
 
-    def _process_row(row):
-        results = []
-        sub_lengths = []
-
-        for col, path in expansion_paths.items():
-            # Step through the key path. None values represent a wildcard
-            val = row[path[0]]
-            for key in path[1:]:
-                if key is None:
-                    sub_lengths.append(len(val))
-                    break
-            else:
-                raise KeyError(
-                    "key path must contain a None value to use as a wildcard"
-                )
-
-        # Constuct a skeleton row containing all keys that will
-        # be in the target DataFrame
-        row_skeleton = row.dict(keys=target_columns)
-
-        for row_i in range(max(sub_lengths)):
-            for col, path in expansion_paths.items():
-
-                # Step through the key path. None values represent a wildcard
-                val = row[path[0]]
-                for key in path[1:]:
-                    if val is None:
-                        continue
+    # Paths in a group are expanded aligned with each other, and groups are crossed
+    groups = {}
+    for col, path in expansion_paths.items():
+        group = path[0] if mode == "product" else None
+        groups.setdefault(group, []).append((col, path))
+    groups = list(groups.values())
+
+    source_columns = list(dict.fromkeys(path[0] for path in expansion_paths.values()))
+    source_values = zip(*(df[col].tolist() for col in source_columns))
+
+    counts = []
+    new_values = {col: [] for col in expansion_paths}
+    for values in source_values:
+        values = dict(zip(source_columns, values))
+        group_rows = [_expand_aligned(values, group) for group in groups]
+
+        n_rows = 0
+        for row in itertools.product(*group_rows):
+            n_rows += 1
+            for group_row in row:
+                for col, val in group_row:
+                    new_values[col].append("" if val is None else val)
+        counts.append(n_rows)
+
+    # Repeat the rows of the columns that aren't expanded in one take
+    positions = numpy.repeat(numpy.arange(df.shape[0]), counts)
+    base_columns = [col for col in target_columns if col not in expansion_paths]
+    df_expanded = df[base_columns].take(positions).reset_index(drop=True)
+
+    # Missing values in the columns that aren't expanded get the default `none_value`,
+    # as they would when loaded with SchemaField(col)
+    none_value = SchemaField(None).none_value
+    for col in base_columns:
+        values = df_expanded[col]
+        if values.dtype == object:
+            missing = values.map(lambda v: v is None)
+            if missing.any():
+                df_expanded[col] = values.where(~missing, none_value)
+
+    for col, values in new_values.items():
+        df_expanded[col] = pandas.Series(values, dtype=None if values else object)
+
+    return df_expanded[target_columns]
+
+
+def _walk_path(val, keys, prefix=()):
+    """Yield `(wildcard positions, value)` for each value reached by following `keys`
+    from `val`. A None key is a wildcard over the items of a list, a value that isn't a
+    list is treated as a list of one item. Missing values, None or "" as loaded by the
+    default `none_value`, have no items.
+    """
+    for i, key in enumerate(keys):
+        if key is None:
+            if val is None or val == "":
+                return
+            items = val if isinstance(val, (list, tuple)) else [val]
+            for item_i, item in enumerate(items):
+                yield from _walk_path(item, keys[i + 1 :], prefix + (item_i,))
+            return
 
-                    if key is None:
-                        val = val[row_i] if row_i < len(val) else None
-                    else:
-                        val = val.get(key, None)
+        if val is None:
+            break
+        val = val.get(key, None) if isinstance(val, dict) else None
 
-                if len(results) <= row_i:
-                    results.append(row_skeleton.copy())
-                results[row_i][col] = val
+    yield prefix, val
 
-        return results
 
-    results = parallel.df_apply(df, _process_row, return_df=False)
-    raw_records = itertools.chain.from_iterable(
-        itertools.filterfalse(lambda x: x is None, results)
-    )
+def _expand_aligned(values, paths):
+    """Expand a single record along `paths`, a list of `(column, key path)`, aligning the
+    items at each wildcard level by position. Returns a list of output rows, each a list
+    of `(column, value)`.
 
-    field_defs = [SchemaField(col) for col in target_columns]
+    There is a row for each combination of wildcard positions that has no deeper items,
+    so a path with fewer wildcards repeats its value for the rows nested below it and
+    empty nested lists still give a row. A record whose top level lists are all empty
+    gives no rows.
+    """
+    path_values = []
+    positions = set()
+    for col, path in paths:
+        reached = dict(_walk_path(values[path[0]], path[1:]))
+        path_values.append((col, reached, path[1:].count(None)))
+        for position in reached:
+            positions.update(position[:depth] for depth in range(1, len(position) + 1))
+
+    parents = {position[:-1] for position in positions}
+    rows = []
+    for position in sorted(p for p in positions if p not in parents):
+        rows.append(
+            [(col, reached.get(position[:depth])) for col, reached, depth in path_values]
+        )
+    return rows
+
+
+def mapping_columns(mappings):
+    """Return the source column names used by `mappings`, in mapping index order. Pass them
+    as `usecols` to the loaders so columns that the mappings drop are never loaded.
 
-    return load_records(raw_records, field_defs)
+    Example:
+        df = load_csv(inpt, usecols=mapping_columns(mappings))
+        df = apply_mappings(df, mappings)
+    """
+    mappings = sorted(mappings, key=lambda mapping: mapping[0])
+    columns = []
+    for m in mappings:
+        if m[1] not in columns:
+            columns.append(m[1])
+    return columns
 
 
 # mappings in the form: [ [ 'index', 'src_name', 'dest_name' ], ... ]
 def apply_mappings(df, mappings):
+    if isinstance(df, partitioned.PartitionedFrame):
+        return partitioned.apply_mappings(df, mappings)
+
     def _assert_no_duplicates(l, m):
         s = set()
         duplicates = set(x for x in l if x in s or s.add(x))
@@ -316,11 +1192,11 @@ def apply_mappings(df, mappings):
     for m in mappings:
         assert m[1] in df.columns, f"Column not found in dataframe: '{m[1]}'"
 
-    # Rename the columns
-    col_mapings = {m[1]: m[2] for m in mappings}
-    df.rename(columns=col_mapings, inplace=True)
-
-    # Re-Order the columns
     col_order = [m[2] for m in mappings]
     _assert_no_duplicates(col_order, "dest_field names")
-    return df.reindex(columns=col_order, copy=False)
+
+    # Select the columns in their new order, then rename them. This takes a single
+    # copy and leaves the given DataFrame untouched.
+    df = df.reindex(columns=[m[1] for m in mappings])
+    df.columns = col_order
+    return df
@@ -0,0 +1,64 @@
+"""
+Streaming merge helpers for inputs that are sorted on their key columns.
+
+Each helper takes iterators of key tuples, makes a single pass over them using O(1) extra
+memory, and checks the keys really are sorted as it goes, raising a SortOrderError
+otherwise.
+"""
+
+import logging
+
+logger = logging.getLogger(f"{__package__}.sortedmerge")
+
+
+class SortOrderError(ValueError):
+    """Raised when keys declared as sorted are found out of order"""
+
+
+def frame_keys(df, cols):
+    """Iterate over the key tuples of the `cols` of a DataFrame"""
+    return zip(*(df[col] for col in cols))
+
+
+def check_sorted(keys, name="keys"):
+    """Pass `keys` through, raising a SortOrderError if one is smaller than the previous"""
+    keys = iter(keys)
+    prev = next(keys, None)
+    if prev is None:
+        return
+    yield prev
+    for i, key in enumerate(keys, 1):
+        if key < prev:
+            raise SortOrderError(
+                f"{name} are not sorted: {key!r} at position {i} comes after {prev!r}"
+            )
+        yield key
+        prev = key
+
+
+def membership(left_keys, right_keys):
+    """For each of the sorted `left_keys` yield True if it is also one of the sorted
+    `right_keys`, False otherwise.
+    """
+    right_keys = check_sorted(right_keys, "right-hand keys")
+    right = next(right_keys, None)
+    for left in check_sorted(left_keys, "left-hand keys"):
+        while right is not None and right < left:
+            right = next(right_keys, None)
+        yield right is not None and right == left
+
+
+def duplicate_positions(keys):
+    """Yield the positions of each of the sorted `keys` that is equal to an adjacent key"""
+    prev = None
+    run_start = None
+    for i, key in enumerate(check_sorted(keys)):
+        if i > 0 and key == prev:
+            # The first key of a run is only known to be a duplicate once its second is seen
+            if run_start is not None:
+                yield run_start
+                run_start = None
+            yield i
+        else:
+            run_start = i
+        prev = key
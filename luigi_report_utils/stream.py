@@ -0,0 +1,388 @@
+"""
+A lightweight record stream API for small and streaming jobs.
+
+A `RecordStream` is a lazily evaluated chain of generators over tuple records. It follows
+the same `SchemaField`, `ValueTranslator.translate_row`, exclusion list and validation
+semantics as the DataFrame based API, but never builds a DataFrame unless `to_frame()` is
+called. Nothing is read or processed until the stream is iterated.
+
+Example:
+    rs = stream.from_jsonl(inpt, field_defs)
+    rs = rs.exclude(df_exclude, [("ID", "EXCLUDE_ID")]).translate(translator)
+    failures = list(stream.unique_keys(rs, ["ID"]))
+    df = rs.to_frame()
+"""
+
+import csv
+import json
+import itertools
+
+from . import records, sortedmerge
+
+import logging
+
+logger = logging.getLogger(f"{__package__}.stream")
+
+
+class Record:
+    """A dictionary style view of a single stream record"""
+
+    __slots__ = ("_positions", "_values")
+
+    def __init__(self, positions, values):
+        self._positions = positions
+        self._values = values
+
+    def _field_i(self, name):
+        try:
+            return self._positions[name]
+        except KeyError:
+            raise KeyError(
+                f"key '{name}' not found on record. Available keys are: {list(self._positions)}"
+            )
+
+    def __getitem__(self, key):
+        return self._values[self._field_i(key)]
+
+    def __setitem__(self, key, value):
+        self._values[self._field_i(key)] = value
+
+    def get(self, key, value=None):
+        i = self._positions.get(key)
+        return value if i is None else self._values[i]
+
+    def dict(self, keys=None):
+        return {
+            key: self._values[i]
+            for key, i in self._positions.items()
+            if keys is None or key in keys
+        }
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __str__(self):
+        return f"Record({self.dict()!r})"
+
+
+class RecordStream:
+    """An iterable of tuple records with the given `columns`. `rows` is a callable that
+    returns a fresh iterator of rows, so a stream can be iterated more than once as long
+    as its source can be. `types` maps columns to their SchemaField types, which are
+    applied to the whole column again by `to_frame()`.
+    """
+
+    def __init__(self, columns, rows, types=None):
+        self.columns = list(columns)
+        self.types = dict(types) if types is not None else {}
+        self._rows = rows
+
+    def __iter__(self):
+        return iter(self._rows())
+
+    def _chain(self, f, columns=None):
+        """Return a new stream whose rows are `f(rows)` of this stream's rows"""
+        return RecordStream(
+            self.columns if columns is None else columns,
+            lambda: f(self._rows()),
+            types=self.types,
+        )
+
+    def _positions(self):
+        return {col: i for i, col in enumerate(self.columns)}
+
+    def map(self, f):
+        """Call `f` with a `Record` for each row. `f` may modify the record in place"""
+        positions = self._positions()
+
+        def _map(rows):
+            for row in rows:
+                values = list(row)
+                f(Record(positions, values))
+                yield tuple(values)
+
+        return self._chain(_map)
+
+    def filter(self, f):
+        """Keep only the rows where `f` called with a `Record` returns True"""
+        positions = self._positions()
+        return self._chain(
+            lambda rows: (row for row in rows if f(Record(positions, row)))
+        )
+
+    def select(self, columns):
+        """Keep only the given columns, in the given order"""
+        positions = self._positions()
+        idx = [positions[col] for col in columns]
+        return self._chain(
+            lambda rows: (tuple(row[i] for i in idx) for row in rows), columns=columns
+        )
+
+    def translate(self, translator):
+        """Apply `ValueTranslator.translate_row` to each row"""
+        return self.map(translator.translate_row)
+
+    def exclude(self, exclusions, match_tuples):
+        """Stream version of `records.apply_exclusion_list`. Drops rows where the columns
+        specified in `match_tuples` correspond to a row in `exclusions`, which may be a
+        DataFrame, a RecordStream, or an inpt for an exclusion list csv.
+        """
+        positions = self._positions()
+        for match_tuple in match_tuples:
+            if match_tuple[0] not in positions:
+                raise KeyError(
+                    "column {} doesn't exist in the target stream".format(
+                        match_tuple[0].__repr__()
+                    )
+                )
+
+        idx = [positions[m[0]] for m in match_tuples]
+        exclude_cols = [m[1] for m in match_tuples]
+
+        def _exclude(rows):
+            excluded = _key_set(exclusions, exclude_cols)
+            for row in rows:
+                if tuple(row[i] for i in idx) not in excluded:
+                    yield row
+
+        return self._chain(_exclude)
+
+    def to_dicts(self):
+        """Iterate over the rows as dictionaries"""
+        return (dict(zip(self.columns, row)) for row in self)
+
+    def to_frame(self, index=None):
+        """Materialize the stream as a DataFrame, applying the SchemaField types"""
+        import pandas
+
+        df = pandas.DataFrame.from_records(iter(self), index=index, columns=self.columns)
+        for col, col_type in self.types.items():
+            if col in df.columns:
+                df[col] = df[col].astype(col_type)
+        return df
+
+
+def _key_set(source, cols):
+    """Build a set of key tuples from the `cols` of a DataFrame, RecordStream or csv inpt"""
+    if isinstance(source, RecordStream):
+        return set(iter(source.select(cols)))
+    if hasattr(source, "columns"):
+        for col in cols:
+            if col not in source.columns:
+                raise KeyError(
+                    "column {} doesn't exist in the exclusion list".format(col.__repr__())
+                )
+        return set(zip(*(source[col] for col in cols)))
+    return set(iter(from_csv(source).select(cols)))
+
+
+def _value_converter(col_type):
+    """Return a function converting a single value to the SchemaField type `col_type`,
+    so that stream values compare the same as the values of a loaded DataFrame column.
+    Returns None for types whose values are kept as they are, e.g. categories.
+    """
+    import pandas
+
+    dtype = pandas.api.types.pandas_dtype(col_type)
+    if isinstance(dtype, pandas.CategoricalDtype):
+        return None
+    if isinstance(dtype, pandas.StringDtype):
+        return str
+    if dtype.kind in "iu":
+        return int
+    if dtype.kind == "f":
+        return float
+    if dtype.kind == "b":
+        return bool
+    if dtype.kind == "M":
+        return pandas.Timestamp
+    if dtype.kind in "OSU":
+        return str
+    return None
+
+
+def from_records(raw_records, field_defs):
+    """Stream version of `records.load_records`. `raw_records` is a callable returning an
+    iterator of dictionary records, or an iterable that will only be iterated once.
+
+    The SchemaField types are applied to each value as it's read, after the transforms
+    and `none_value`, so that exclusions, translations and checks see typed values.
+    Missing values are left as None.
+    """
+    for field_def in field_defs:
+        if field_def.vector_transform is not None:
+            raise ValueError(
+                f"field {field_def.name!r}: vector_transform isn't supported on streams"
+            )
+
+    columns = [field_def.name for field_def in field_defs]
+    types = {f.name: f.type for f in field_defs if f.type is not None}
+    transforms = [
+        records._maybe_make_list(f.transform) if f.transform is not None else ()
+        for f in field_defs
+    ]
+    converters = [
+        _value_converter(f.type) if f.type is not None else None for f in field_defs
+    ]
+    fields = list(zip(field_defs, transforms, converters))
+
+    def _process(src_records):
+        for src in src_records:
+            record = []
+            for field_def, field_transforms, converter in fields:
+                value = src.get(field_def.name, None)
+                for f in field_transforms:
+                    value = f(value)
+
+                if value is None:
+                    if field_def.filter_none is True:
+                        break
+                    if field_def.none_value is not None:
+                        value = field_def.none_value
+
+                if converter is not None and value is not None:
+                    value = converter(value)
+
+                record.append(value)
+            else:
+                yield tuple(record)
+
+    source = raw_records if callable(raw_records) else lambda: raw_records
+    return RecordStream(columns, lambda: _process(source()), types=types)
+
+
+def from_jsonl(inpt, field_defs):
+    """Stream version of `records.load_jsonl`. The input is opened each time the stream is
+    iterated.
+    """
+
+    def _read():
+        logger.info(f"Streaming records from {inpt}")
+        with inpt.open("r") as input_file:
+            yield from map(json.loads, input_file)
+
+    return from_records(_read, field_defs)
+
+
+def from_csv(inpt, field_defs=None):
+    """Stream version of `records.load_csv`. The input is opened each time the stream is
+    iterated.
+    """
+    csv.register_dialect("strict", strict=True)
+
+    if field_defs is None:
+        # Peek at the header to generate a default list of field_defs with all columns
+        with inpt.open("r") as input_file:
+            fieldnames = next(csv.reader(input_file, dialect="strict"), [])
+        field_defs = [
+            records.SchemaField(fieldname, type="str") for fieldname in fieldnames
+        ]
+
+    def _read():
+        logger.info(f"Streaming records from {inpt}")
+        with inpt.open("r") as input_file:
+            yield from csv.DictReader(input_file, dialect="strict")
+
+    return from_records(_read, field_defs)
+
+
+def _stream_keys(source, cols):
+    """Iterate over the key tuples of the `cols` of a DataFrame, RecordStream or csv inpt"""
+    if isinstance(source, RecordStream):
+        return iter(source.select(cols))
+    if hasattr(source, "columns"):
+        return sortedmerge.frame_keys(source, cols)
+    return iter(from_csv(source).select(cols))
+
+
+def xref_integrity(
+    rs_left, on_left, right, on_right, ignore_blanks=False, assume_sorted=False
+):
+    """Stream version of `validate.xref_integrity`. `right` may be a DataFrame, a
+    RecordStream, or an inpt for a csv. Yields a failure for each left-hand record whose
+    keys aren't found on the right-hand side, containing the left-hand record's values.
+
+    The right-hand keys are held in a set, unless `assume_sorted` is True, in which case
+    both sides must be sorted on their keys and are compared with a linear merge.
+    """
+    on_left = records._maybe_make_list(on_left)
+    on_right = records._maybe_make_list(on_right)
+
+    failure_label = "xref_integrity[{} == {}]".format(",".join(on_left), ",".join(on_right))
+
+    positions = rs_left._positions()
+    idx = [positions[col] for col in on_left]
+
+    if assume_sorted:
+        left_rows, left_keys = itertools.tee(iter(rs_left))
+        left_keys = (tuple(row[i] for i in idx) for row in left_keys)
+        found = sortedmerge.membership(left_keys, _stream_keys(right, on_right))
+        rows = (row for row, is_found in zip(left_rows, found) if not is_found)
+    else:
+        right_keys = _key_set(right, on_right)
+        rows = (row for row in rs_left if tuple(row[i] for i in idx) not in right_keys)
+
+    for row in rows:
+        key = tuple(row[i] for i in idx)
+        if ignore_blanks and all(v == "" for v in key):
+            continue
+
+        message = "Missing right-hand record matching: " + str(dict(zip(on_right, key)))
+        yield [failure_label, message, *row]
+
+
+def unique_keys(rs, keys=None, assume_sorted=False):
+    """Stream version of `validate.unique_keys`. Yields a failure for every record that
+    shares its keys with another record.
+
+    The first record seen with each key is held in memory, and is reported when its first
+    duplicate is found, so failures are grouped differently than the DataFrame version
+    but the same records are reported. If `assume_sorted` is True the stream must be sorted
+    on `keys`, and only adjacent records are compared, using O(1) memory.
+    """
+    failure_label = f"unique_keys[{keys}]"
+
+    if keys is None:
+        idx = list(range(len(rs.columns)))
+    else:
+        positions = rs._positions()
+        idx = [positions[k] for k in keys]
+
+    def _failure(row):
+        message = "duplicate row"
+        if keys is not None:
+            message = "duplicate keys: {!r}".format([row[i] for i in idx])
+        return [failure_label, message, *row]
+
+    if assume_sorted:
+        prev_key = prev_row = None
+        reported = False
+        for row in rs:
+            key = tuple(row[i] for i in idx)
+            if prev_key is not None and key < prev_key:
+                raise sortedmerge.SortOrderError(
+                    f"keys are not sorted: {key!r} comes after {prev_key!r}"
+                )
+            if key == prev_key:
+                if not reported:
+                    yield _failure(prev_row)
+                    reported = True
+                yield _failure(row)
+            else:
+                reported = False
+            prev_key, prev_row = key, row
+        return
+
+    # key -> the first record with that key, or None once it has been reported
+    seen = {}
+    for row in rs:
+        key = tuple(row[i] for i in idx)
+        if key not in seen:
+            seen[key] = row
+            continue
+
+        first = seen[key]
+        if first is not None:
+            yield _failure(first)
+            seen[key] = None
+        yield _failure(row)
@@ -1,2 +1,4 @@
 from .etlcmd_task import EtlcmdTask
 from .udt_export_task import UdtExportTask
+from .sharded_export_task import ShardedUdtExportTask
+from .dataframe_target import DataFrameTarget, FrameStore
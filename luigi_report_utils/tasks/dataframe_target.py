@@ -0,0 +1,148 @@
+import os
+import pickle
+import tempfile
+import threading
+import collections
+import multiprocessing
+
+import luigi
+
+from .. import memory
+from ..inpt import _chmod_default
+
+import logging
+
+logger = logging.getLogger(f"{__package__}.dataframe_target")
+
+# Default size bound of the process-local frame store
+_DEFAULT_MAX_BYTES = "1GiB"
+
+
+class FrameStore:
+    """A process-local store of DataFrames keyed by path, bounded by their estimated size.
+    The least recently used frames are evicted once the bound is exceeded, and are spilled
+    to a pickle file at their path so they can still be loaded.
+    """
+
+    def __init__(self, max_bytes=_DEFAULT_MAX_BYTES):
+        self.max_bytes = memory.parse_size(max_bytes)
+        self.total_bytes = 0
+        self._frames = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, path):
+        return path in self._frames
+
+    def put(self, path, df):
+        size = memory.frame_size(df)
+        evicted = []
+        with self._lock:
+            self._discard(path)
+            self._frames[path] = (df, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and len(self._frames) > 1:
+                evicted_path, (evicted_df, evicted_size) = self._frames.popitem(
+                    last=False
+                )
+                self.total_bytes -= evicted_size
+                evicted.append((evicted_path, evicted_df))
+
+        for evicted_path, evicted_df in evicted:
+            logger.info(f"Evicting frame {evicted_path} from the frame store")
+            spill(evicted_path, evicted_df)
+
+    def get(self, path):
+        """Return the frame stored at `path`, or None if it isn't in the store"""
+        with self._lock:
+            entry = self._frames.get(path)
+            if entry is None:
+                return None
+            self._frames.move_to_end(path)
+            return entry[0]
+
+    def discard(self, path):
+        with self._lock:
+            self._discard(path)
+
+    def _discard(self, path):
+        entry = self._frames.pop(path, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+
+# The store shared by DataFrameTargets in this process
+default_store = FrameStore()
+
+
+def spill(path, df):
+    """Atomically write `df` to `path` as a pickle file"""
+    dir_name = os.path.dirname(path) or "."
+    os.makedirs(dir_name, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=dir_name, prefix=".tmp-frame-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        _chmod_default(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _in_worker_process():
+    # luigi runs tasks in child processes when there is more than one worker, where frames
+    # stored in memory aren't visible to the tasks that consume them.
+    return multiprocessing.current_process().name != "MainProcess"
+
+
+class DataFrameTarget(luigi.Target):
+    """A luigi target for a DataFrame that is passed between tasks through an in-memory
+    `FrameStore` rather than written to and re-read from csv or json lines.
+
+    The frame is written to a pickle file at `path` when it is evicted from the store, or
+    straight away when it is saved from a luigi worker process. Frames are only kept in
+    memory for the life of the process, so a target that was never spilled no longer
+    exists when the process exits.
+
+    Example:
+        def output(self):
+            return DataFrameTarget(os.path.join(self.work_dir, "merged.pickle"))
+
+        def run(self):
+            df = self.input().load()
+            ...
+            self.output().save(df)
+    """
+
+    def __init__(self, path, store=None):
+        self.path = path
+        self.store = default_store if store is None else store
+
+    def __str__(self):
+        return self.path
+
+    def exists(self):
+        return self.path in self.store or os.path.exists(self.path)
+
+    def save(self, df):
+        if _in_worker_process():
+            spill(self.path, df)
+        else:
+            self.store.put(self.path, df)
+
+    def load(self, copy=True):
+        """Return the saved frame. Unless `copy` is false a copy is returned, so that
+        in-place changes by the consumer don't alter the stored frame.
+        """
+        df = self.store.get(self.path)
+        if df is None:
+            with open(self.path, "rb") as f:
+                df = pickle.load(f)
+            if not _in_worker_process():
+                self.store.put(self.path, df)
+        return df.copy() if copy else df
+
+    def remove(self):
+        self.store.discard(self.path)
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -4,17 +4,44 @@ import luigi
 
 from luigi.contrib.external_program import ExternalProgramTask
 
+from .. import inpt
+
 
 class EtlcmdTask(ExternalProgramTask):
+    """Runs etlcmd with the given config file.
+
+    With `stream_stdout=True` the config is expected to write its output to stdout instead
+    of `output_path`. `open_stream()` then exposes that output as an inpt which downstream
+    code can parse (e.g. with `records.load_jsonl`) while the export is still running. The
+    streamed output is also written to `output_path`, atomically, once etlcmd succeeds.
+    """
+
     task_namespace = "etlcmd"
     config_file = luigi.Parameter()
     output_path = luigi.Parameter()
+    stream_stdout = luigi.BoolParameter(default=False)
 
     def program_args(self):
         return ["etlcmd", "--config", self.config_file]
 
+    def open_stream(self):
+        if not self.stream_stdout:
+            raise ValueError("open_stream() requires stream_stdout=True")
+
+        self.output().makedirs()
+        return inpt.from_process(
+            self.program_args(),
+            output_path=self.output_path,
+            env=self.program_environment(),
+        )
+
     def run(self):
         self.output().makedirs()
+        if self.stream_stdout:
+            # Nobody is consuming the stream. Closing it drains the remaining output
+            # into output_path and raises if etlcmd failed.
+            self.open_stream().open("rb").close()
+            return
         super(EtlcmdTask, self).run()
 
     def output(self):
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import luigi
+
+from . import EtlcmdTask
+from .udt_export_task import render_config
+
+
+class ShardedUdtExportTask(luigi.Task):
+    """Splits a UniData export into `shard_count` EtlcmdTasks that can run in parallel and
+    concatenates their output parts into `output_path`.
+
+    `process` is a template for the etlcmd process block, rendered once per shard with
+    %-style named placeholders:
+        %(shard_index)s  the index of the shard, from 0 to shard_count - 1
+        %(shard_count)s  the total number of shards
+        %(output_path)s  the path the shard should write its output part to
+    Use them to select a distinct key range or modulo of the records in each shard. Literal
+    percent signs in the template must be escaped as %%.
+
+    Run with at least `shard_count` luigi workers for the shards to export concurrently. The
+    parts are concatenated in shard order, skipping the first `header_lines` lines of every
+    part but the first.
+    """
+
+    udt_host = luigi.Parameter()
+    udt_username = luigi.Parameter()
+    udt_password = luigi.Parameter()
+    udt_bin = luigi.Parameter()
+    udt_home = luigi.Parameter()
+    udt_acct = luigi.Parameter()
+
+    process = luigi.Parameter()
+    output_path = luigi.Parameter()
+    shard_count = luigi.IntParameter(default=4)
+    header_lines = luigi.IntParameter(default=0)
+
+    def part_path(self, shard_index):
+        return "%s.part-%d-of-%d" % (self.output_path, shard_index, self.shard_count)
+
+    def requires(self):
+        # luigi calls requires() repeatedly, generate the configs only once so the
+        # shard tasks keep the same config files.
+        if getattr(self, "_shard_tasks", None) is not None:
+            return self._shard_tasks
+
+        # Create a temporary directory and save each shard's etlcmd config to it
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="luigi_etlcmd_task")
+
+        self._shard_tasks = []
+        for shard_index in range(self.shard_count):
+            part_path = self.part_path(shard_index)
+            process = self.process % {
+                "shard_index": shard_index,
+                "shard_count": self.shard_count,
+                "output_path": part_path,
+            }
+            config = render_config(
+                self.udt_host,
+                self.udt_username,
+                self.udt_password,
+                self.udt_bin,
+                self.udt_home,
+                self.udt_acct,
+                process,
+            )
+
+            config_file = os.path.join(self.temp_dir.name, f"config-{shard_index}.hcl")
+            with open(config_file, "w") as f:
+                f.write(config)
+
+            self._shard_tasks.append(
+                EtlcmdTask(config_file=config_file, output_path=part_path)
+            )
+
+        return self._shard_tasks
+
+    def run(self):
+        with self.output().open("w") as f_out:
+            for shard_index, part in enumerate(self.input()):
+                with part.open("r") as f_part:
+                    if shard_index > 0:
+                        for _ in range(self.header_lines):
+                            f_part.readline()
+                    shutil.copyfileobj(f_part, f_out, 1024 * 1024)
+
+    def output(self):
+        return luigi.LocalTarget(path=self.output_path)
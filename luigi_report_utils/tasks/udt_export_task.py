@@ -5,6 +5,33 @@ import luigi
 from . import EtlcmdTask
 
 
+def render_config(
+    udt_host, udt_username, udt_password, udt_bin, udt_home, udt_acct, process
+):
+    """Render an etlcmd config file that runs `process` against the given UniData account"""
+    return """
+unidata {
+	host = "%s"
+
+	username = "%s"
+	password = "%s"
+
+	udtbin  = "%s"
+	udthome = "%s"
+	udtacct = "%s"
+}
+%s
+""" % (
+        udt_host,
+        udt_username,
+        udt_password,
+        udt_bin,
+        udt_home,
+        udt_acct,
+        process,
+    )
+
+
 class UdtExportTask(luigi.WrapperTask):
 
     udt_host = luigi.Parameter()
@@ -18,19 +45,7 @@ class UdtExportTask(luigi.WrapperTask):
     output_path = luigi.Parameter()
 
     def requires(self):
-        config = """
-unidata {
-	host = "%s"
-
-	username = "%s"
-	password = "%s"
-
-	udtbin  = "%s"
-	udthome = "%s"
-	udtacct = "%s"
-}
-%s
-""" % (
+        config = render_config(
             self.udt_host,
             self.udt_username,
             self.udt_password,
@@ -0,0 +1,51 @@
+"""
+Vectorized field transforms for use with SchemaField(vector_transform=...)
+
+Each transform takes the whole column as a `pandas.Series` and returns the transformed
+Series. Transforms that need configuring are factories which return the transform, e.g.
+`SchemaField("DATE", vector_transform=transforms.to_datetime("%m/%d/%Y"))`.
+"""
+
+import pandas
+
+import logging
+
+logger = logging.getLogger(f"{__package__}.transforms")
+
+
+def strip(values):
+    """Strip leading and trailing whitespace from string values"""
+    return values.str.strip()
+
+
+def upper(values):
+    """Convert string values to upper case"""
+    return values.str.upper()
+
+
+def lower(values):
+    """Convert string values to lower case"""
+    return values.str.lower()
+
+
+def blank_to_none(values):
+    """Replace empty strings with None so they can be filtered with `filter_none`"""
+    return values.where(values.ne(""), None)
+
+
+def to_datetime(format=None, errors="coerce"):
+    """Return a transform that parses values into datetimes, see `pandas.to_datetime`"""
+
+    def _to_datetime(values):
+        return pandas.to_datetime(values, format=format, errors=errors)
+
+    return _to_datetime
+
+
+def to_numeric(errors="coerce", downcast=None):
+    """Return a transform that parses values into numbers, see `pandas.to_numeric`"""
+
+    def _to_numeric(values):
+        return pandas.to_numeric(values, errors=errors, downcast=downcast)
+
+    return _to_numeric
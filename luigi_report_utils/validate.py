@@ -1,33 +1,49 @@
+import os
+import math
+import pickle
+import tempfile
 import itertools
+import collections
+import numpy
 import pandas
 
-from . import records, parallel
+from . import keyindex, records, parallel, partitioned, sortedmerge
 
 import logging
 
 logger = logging.getLogger(f"{__package__}.validate")
 
+# Default number of spill files `unique_keys_external` hash-partitions the rows into
+_EXTERNAL_PARTITIONS = 16
 
-def xref_integrity(df_left, on_left, df_right, on_right, ignore_blanks=False):
-    """
-    Given two dataframes, df_left and df_right, and their respective tuples of key columns, check_xref
-    will return a list of any records whose set of keys are found in the left dataframe only.
-    """
+# Default number of left-hand rows sampled by `estimate_xref_integrity`
+_ESTIMATE_SAMPLE_SIZE = 10000
 
-    # Convert arguments to lists if needed
-    on_left = records._maybe_make_list(on_left)
-    on_right = records._maybe_make_list(on_right)
+DuplicateEstimate = collections.namedtuple(
+    "DuplicateEstimate", ["rows", "distinct", "duplicates", "low", "high"]
+)
+DuplicateEstimate.__doc__ = """The result of `estimate_unique_keys`. `duplicates` is the
+estimated number of rows repeating the keys of an earlier row, between `low` and `high`."""
+
+OrphanEstimate = collections.namedtuple(
+    "OrphanEstimate", ["rows", "sampled", "rate", "low", "high", "orphans"]
+)
+OrphanEstimate.__doc__ = """The result of `estimate_xref_integrity`. `rate` is the
+estimated fraction of left-hand rows without a right-hand match, between `low` and `high`,
+and `orphans` is the estimated number of them."""
 
-    # The identifier to add to each row to indicate which check generated the failure
-    failure_label = "xref_integrity[{} == {}]".format(",".join(on_left), ",".join(on_right))
 
+def _left_only(df_left, on_left, df_right, on_right):
+    """Return the rows of `df_left` with no matching row in `df_right`"""
     # Combine the two dataframes trying to match rows together based on the given columns
     # TODO: support colliding column names, remove suffixes=(False, False), and make sure we
     # don't drop a column from the right-hand side that was also in the left-hand side.
+    # Rows only found on the right-hand side can never be failures, so a left join is
+    # enough, and keeps them from upcasting the left-hand columns.
     df = pandas.merge(
         df_left,
         df_right,
-        how="outer",
+        how="left",
         left_on=on_left,
         right_on=on_right,
         suffixes=(False, False),
@@ -43,13 +59,61 @@ def xref_integrity(df_left, on_left, df_right, on_right, ignore_blanks=False):
     on_right_uniq = [elem for elem in on_right if elem not in on_left]
     df.drop(columns=["_merge"] + on_right_uniq, inplace=True)
 
+    return df
+
+
+def xref_integrity(
+    df_left, on_left, df_right, on_right, ignore_blanks=False, assume_sorted=False
+):
+    """
+    Given two dataframes, df_left and df_right, and their respective tuples of key columns, check_xref
+    will return a list of any records whose set of keys are found in the left dataframe only.
+
+    df_right may also be a `keyindex.KeyIndex` built from the right-hand extract, in which
+    case the failed records only contain the left-hand columns.
+
+    If `assume_sorted` is True both dataframes must be sorted on their key columns and
+    they are compared with a linear merge instead of a join. The failed records then only
+    contain the left-hand columns. A `sortedmerge.SortOrderError` is raised if they aren't
+    sorted.
+    """
+    if isinstance(df_left, partitioned.PartitionedFrame):
+        return partitioned.xref_integrity(
+            df_left, on_left, df_right, on_right, ignore_blanks=ignore_blanks
+        )
+
+    if isinstance(df_right, partitioned.PartitionedFrame):
+        # The left-hand side is a single frame, so check it against the whole right side
+        df_right = df_right.compute()
+
+    # Convert arguments to lists if needed
+    on_left = records._maybe_make_list(on_left)
+    on_right = records._maybe_make_list(on_right)
+
+    # The identifier to add to each row to indicate which check generated the failure
+    failure_label = "xref_integrity[{} == {}]".format(",".join(on_left), ",".join(on_right))
+
+    if isinstance(df_right, keyindex.KeyIndex):
+        # Look the keys up in the index rather than merging with the full reference
+        cols = df_right.left_columns(on_left, on_right)
+        df = df_left.loc[~df_right.contains(df_left, cols)]
+    elif assume_sorted:
+        found = sortedmerge.membership(
+            sortedmerge.frame_keys(df_left, on_left),
+            sortedmerge.frame_keys(df_right, on_right),
+        )
+        df = df_left.loc[~numpy.fromiter(found, dtype=bool, count=df_left.shape[0])]
+    else:
+        df = _left_only(df_left, on_left, df_right, on_right)
+
     # Don't fail records where the keys are just blank if thats
     # what the user wants
     if ignore_blanks:
         ignore_condition = df[on_left[0]].eq("")
         for key in on_left[1:]:
             ignore_condition &= df[key].eq("")
-        df = df.loc[~ignore_condition]
+        # Comparisons on nullable (e.g. Arrow string) columns are NA for missing values
+        df = df.loc[~ignore_condition.fillna(False)]
 
     # Iterate through all the failures and put them in the standard
     # failed records check format.
@@ -67,11 +131,22 @@ def xref_integrity(df_left, on_left, df_right, on_right, ignore_blanks=False):
     return failed_records
 
 
-def unique_keys(df, keys=None):
+def unique_keys(df, keys=None, assume_sorted=False):
     """Validate that there are only unique combinations of values in the columns specified by `keys`
+
+    If `assume_sorted` is True the dataframe must be sorted on `keys` and duplicates are
+    found by comparing adjacent rows instead of hashing. A `sortedmerge.SortOrderError` is
+    raised if it isn't sorted.
     """
+    if isinstance(df, partitioned.PartitionedFrame):
+        return partitioned.unique_keys(df, keys)
 
-    df = df.copy().loc[df.duplicated(keys, keep=False)]
+    if assume_sorted:
+        cols = keys if keys is not None else list(df.columns)
+        positions = sortedmerge.duplicate_positions(sortedmerge.frame_keys(df, cols))
+        df = df.iloc[list(positions)]
+    else:
+        df = df.copy().loc[df.duplicated(keys, keep=False)]
 
     # The identifier to add to each row to indicate which check generated the failure
     failure_label = f"unique_keys[{keys}]"
@@ -88,3 +163,174 @@ def unique_keys(df, keys=None):
     failed_records = itertools.filterfalse(lambda x: x is None, results)
 
     return failed_records
+
+
+def _read_spill(path):
+    """Read the DataFrames appended to a spill file by `unique_keys_external`"""
+    frames = []
+    with open(path, "rb") as f:
+        while True:
+            try:
+                frames.append(pickle.load(f))
+            except EOFError:
+                break
+    return pandas.concat(frames, ignore_index=True)
+
+
+def unique_keys_external(
+    chunks, keys=None, partitions=_EXTERNAL_PARTITIONS, pool=None, spill_dir=None
+):
+    """Like `unique_keys`, for an iterator of DataFrame `chunks` that together don't fit in
+    memory.
+
+    The rows of each chunk are hash-partitioned on their keys into `partitions` spill
+    files, so that all rows with the same keys land in the same file. Each file is then
+    checked on its own, in parallel on `pool` (a process pool by default), and the failed
+    records are yielded a partition at a time with the rows of each duplicate group
+    together. A partition must fit in memory.
+    """
+    with tempfile.TemporaryDirectory(
+        prefix="luigi_report_utils_unique_", dir=spill_dir
+    ) as temp_dir:
+        paths = [os.path.join(temp_dir, f"part-{i}.pickle") for i in range(partitions)]
+        spill_files = [None] * partitions
+        try:
+            n_rows = 0
+            for chunk in chunks:
+                # Hashed independently of dtype, so e.g. a key of 1 in an int64 chunk
+                # and 1.0 in a float64 chunk land in the same partition
+                part_i = partitioned._hash_keys(chunk, keys) % numpy.uint64(partitions)
+                for i in numpy.unique(part_i):
+                    if spill_files[i] is None:
+                        spill_files[i] = open(paths[i], "wb")
+                    pickle.dump(
+                        chunk.loc[part_i == i],
+                        spill_files[i],
+                        protocol=pickle.HIGHEST_PROTOCOL,
+                    )
+                n_rows += chunk.shape[0]
+        finally:
+            for f in spill_files:
+                if f is not None:
+                    f.close()
+
+        spilled = [path for path, f in zip(paths, spill_files) if f is not None]
+        logger.info(f"Spilled {n_rows} rows into {len(spilled)} partitions")
+
+        def _check(path):
+            df = _read_spill(path)
+            cols = keys if keys is not None else list(df.columns)
+            df = df.loc[df.duplicated(cols, keep=False)]
+            # Sort so the rows of each duplicate group are yielded together
+            df = df.sort_values(cols, kind="mergesort").reset_index(drop=True)
+            return list(unique_keys(df, keys))
+
+        pool = pool or parallel._make_pool("process")
+        for failed_records in pool.imap(_check, spilled):
+            yield from failed_records
+
+
+def _z_score(confidence):
+    """Return the two-sided standard normal z-score of `confidence`, found by bisecting
+    erf since statistics.NormalDist needs Python 3.8
+    """
+    low, high = 0.0, 40.0
+    for _ in range(100):
+        z = (low + high) / 2
+        if math.erf(z / math.sqrt(2)) < confidence:
+            low = z
+        else:
+            high = z
+    return (low + high) / 2
+
+
+def _wilson_interval(successes, n, z):
+    """Return the Wilson score interval of a binomial proportion"""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+
+def estimate_unique_keys(df, keys=None, precision=14, confidence=0.95):
+    """Estimate how many duplicates `unique_keys` would find, from a HyperLogLog count of
+    the distinct keys, see `keyindex.HyperLogLog`. Returns a `DuplicateEstimate` with
+    bounds at the given `confidence`.
+
+    `unique_keys` fails every row of a duplicate group, so it fails between `duplicates`
+    and twice as many rows.
+    """
+    cols = keys if keys is not None else list(df.columns)
+    sketch = keyindex.HyperLogLog(precision)
+    sketch.add(keyindex.key_hashes(df, cols))
+
+    rows = df.shape[0]
+    distinct = min(sketch.count(), rows)
+    error = _z_score(confidence) * sketch.relative_error * distinct
+    return DuplicateEstimate(
+        rows=rows,
+        distinct=distinct,
+        duplicates=rows - distinct,
+        low=max(0.0, rows - min(distinct + error, rows)),
+        high=min(float(rows), rows - max(distinct - error, 0.0)),
+    )
+
+
+def estimate_xref_integrity(
+    df_left,
+    on_left,
+    df_right,
+    on_right,
+    ignore_blanks=False,
+    sample_size=_ESTIMATE_SAMPLE_SIZE,
+    fp_rate=0.01,
+    confidence=0.95,
+    random_state=None,
+):
+    """Estimate how many records `xref_integrity` would fail, by checking a random sample
+    of `sample_size` left-hand rows against a Bloom filter of the right-hand keys, or the
+    filter of `df_right` if it is a `keyindex.KeyIndex`. Returns an `OrphanEstimate` with
+    a Wilson score interval at the given `confidence`, corrected for the filter's false
+    positives.
+
+    Keys are compared by their string values, see `keyindex.key_hashes`.
+    """
+    on_left = records._maybe_make_list(on_left)
+    on_right = records._maybe_make_list(on_right)
+
+    if isinstance(df_right, keyindex.KeyIndex):
+        bloom = df_right.bloom
+    else:
+        bloom = keyindex.BloomFilter.for_capacity(df_right.shape[0], fp_rate)
+        bloom.add(keyindex.key_hashes(df_right, on_right))
+
+    if ignore_blanks:
+        blank = df_left[on_left[0]].eq("")
+        for key in on_left[1:]:
+            blank &= df_left[key].eq("")
+        df_left = df_left.loc[~blank.fillna(False)]
+
+    rows = df_left.shape[0]
+    if rows > sample_size:
+        sample = df_left.sample(n=sample_size, random_state=random_state)
+    else:
+        sample = df_left
+    sampled = sample.shape[0]
+    found = bloom.contains(keyindex.key_hashes(sample, on_left))
+    missing = int(numpy.count_nonzero(~found))
+
+    # An orphan is only seen as missing if it isn't a false positive of the filter
+    seen = 1 - bloom.false_positive_rate()
+    low, high = _wilson_interval(missing, sampled, _z_score(confidence))
+    rate = min(1.0, missing / sampled / seen) if sampled else 0.0
+    return OrphanEstimate(
+        rows=rows,
+        sampled=sampled,
+        rate=rate,
+        low=min(1.0, low / seen),
+        high=min(1.0, high / seen),
+        orphans=rate * rows,
+    )
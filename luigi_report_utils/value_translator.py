@@ -56,6 +56,12 @@ class ValueTranslator:
 
         Returns: None (Modifies the dataframe in-place)
         """
+        # Imported here so importing this module doesn't pull in pandas
+        from . import partitioned
+
+        if isinstance(df, partitioned.PartitionedFrame):
+            return partitioned.translate(self, df)
+
         for (match_cols, vtt) in self.translation_tables.items():
             vtt.translate(df, match_cols)
 
@@ -75,11 +81,15 @@ class ValueTranslationTable:
         for rows in the DataFrame where the columns specified in `match_cols` contain
         values that are also in `valmap`
         """
+        # Imported here so importing this module doesn't pull in numpy
+        import numpy
+
         def build_match_cond(match_vals):
             match_cond = df[match_cols[0]].eq(match_vals[0])
             for (col, val) in zip(match_cols[1:], match_vals[1:]):
                 match_cond &= df[col].eq(val)
-            return match_cond
+            # Comparisons on nullable (e.g. Arrow string) columns are NA for missing values
+            return match_cond.fillna(False)
 
         newval_col = match_cols[-1]
 
@@ -94,12 +104,19 @@ class ValueTranslationTable:
             defered_assignments = []
 
             for (match_vals, new_val) in self.valmap.items():
-                idx = df.index[build_match_cond(match_vals)]
-                if idx.size > 0:
-                    defered_assignments.append((idx, newval_col, new_val))
-
-            for (idx, col, val) in defered_assignments:
-                df.loc[idx, [col]] = val
+                positions = numpy.flatnonzero(build_match_cond(match_vals).to_numpy())
+                if positions.size > 0:
+                    defered_assignments.append((positions, new_val))
+
+            # Apply all the assignments as one write to the column, which keeps the
+            # column's dtype (e.g. Arrow strings or floats) where the new values fit it.
+            if defered_assignments:
+                rows = []
+                values = []
+                for (positions, new_val) in defered_assignments:
+                    rows.extend(positions)
+                    values.extend([new_val] * positions.size)
+                parallel._write_column(df, df.columns.get_loc(newval_col), rows, values)
         else:
             def _process_row(row):
                 values = tuple((row[c] for c in match_cols))
@@ -107,7 +124,7 @@ class ValueTranslationTable:
                 if res is not None:
                     row[newval_col] = res
 
-            df[list(match_cols)] = parallel.df_apply(df[list(match_cols)], _process_row)
+            parallel.df_apply(df, _process_row, collect_writes=True)
 
 
 def load_from_csv(_in, match_cols=("old-val",), newval_col="new-val", strict=None):
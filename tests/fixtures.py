@@ -0,0 +1,33 @@
+import unittest
+
+from pathos.pools import ProcessPool
+
+from luigi_report_utils import records
+
+# json lines records with a multi-valued SUBVAL, and two IDs that appear twice
+DATA = "".join(
+    f'{{"ID": "{i % 18}", "CODE": "{i % 4}", "SUBVAL": ["{i}", "{i + 1}"]}}\n'
+    for i in range(20)
+)
+
+FIELD_DEFS = [
+    records.SchemaField("ID"),
+    records.SchemaField("CODE"),
+    records.SchemaField("SUBVAL"),
+]
+
+
+class ProcessPoolTestCase(unittest.TestCase):
+    """Shares a pathos process pool of two workers, `self.pool`, between the tests of
+    the class, and shuts it down once they have run
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = ProcessPool(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+        cls.pool.join()
+        cls.pool.clear()
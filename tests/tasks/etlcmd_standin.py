@@ -0,0 +1,57 @@
+import os
+import sys
+import stat
+import tempfile
+import unittest
+
+from unittest import mock
+
+# A stand-in for the etlcmd program. If the config names an `output` file, every
+# `shard_count`th line of the `input` file after its header, starting at `shard_index`,
+# is copied to it along with the header. Otherwise the whole `input` file is copied to
+# stdout.
+_ETLCMD_STANDIN = """#!%s
+import re
+import sys
+
+config = open(sys.argv[sys.argv.index("--config") + 1]).read()
+settings = dict(re.findall(r'(\\w+) = "(.*)"', config))
+
+with open(settings["input"]) as f_in:
+    if "output" not in settings:
+        for line in f_in:
+            sys.stdout.write(line)
+        sys.exit()
+
+    shard_index = int(settings["shard_index"])
+    shard_count = int(settings["shard_count"])
+    with open(settings["output"], "w") as f_out:
+        lines = f_in.readlines()
+        f_out.write(lines[0])
+        for line in lines[1 + shard_index::shard_count]:
+            f_out.write(line)
+""" % (
+    sys.executable
+)
+
+
+class EtlcmdStandinTestCase(unittest.TestCase):
+    """Runs each test with the etlcmd stand-in first on the PATH, and a temporary
+    directory in `self.temp_dir`
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        bin_dir = os.path.join(self.temp_dir.name, "bin")
+        os.mkdir(bin_dir)
+        etlcmd = os.path.join(bin_dir, "etlcmd")
+        with open(etlcmd, "w") as f:
+            f.write(_ETLCMD_STANDIN)
+        os.chmod(etlcmd, os.stat(etlcmd).st_mode | stat.S_IEXEC)
+
+        path = bin_dir + os.pathsep + os.environ.get("PATH", "")
+        patcher = mock.patch.dict(os.environ, {"PATH": path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
@@ -0,0 +1,88 @@
+import luigi
+import unittest
+import tempfile
+import os
+import stat
+import pandas
+
+from unittest import mock
+
+from luigi_report_utils.tasks import DataFrameTarget, FrameStore
+
+
+class _ProduceTask(luigi.Task):
+    path = luigi.Parameter()
+
+    def output(self):
+        return DataFrameTarget(self.path)
+
+    def run(self):
+        self.output().save(pandas.DataFrame({"A": range(10)}))
+
+
+class _ConsumeTask(luigi.Task):
+    path = luigi.Parameter()
+
+    def requires(self):
+        return _ProduceTask(self.path + ".in")
+
+    def output(self):
+        return DataFrameTarget(self.path)
+
+    def run(self):
+        df = self.input().load()
+        df["A"] += 1
+        self.output().save(df)
+
+
+class TestDataFrameTarget(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def test_chain_in_memory(self):
+        path = os.path.join(self.temp_dir.name, "out.pickle")
+        self.assertTrue(luigi.build([_ConsumeTask(path)], local_scheduler=True))
+
+        # Nothing was written to disk
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+        pandas.testing.assert_frame_equal(
+            DataFrameTarget(path).load(), pandas.DataFrame({"A": range(1, 11)})
+        )
+        pandas.testing.assert_frame_equal(
+            DataFrameTarget(path + ".in").load(), pandas.DataFrame({"A": range(10)})
+        )
+
+    def test_evict_spills(self):
+        df = pandas.DataFrame({"A": range(100)})
+        store = FrameStore(max_bytes=df.memory_usage(deep=True).sum() * 2)
+        targets = [
+            DataFrameTarget(os.path.join(self.temp_dir.name, f"{i}.pickle"), store)
+            for i in range(3)
+        ]
+        for target in targets:
+            target.save(df)
+
+        self.assertNotIn(targets[0].path, store)
+        self.assertTrue(os.path.exists(targets[0].path))
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(targets[0].path).st_mode), 0o666 & ~umask)
+        self.assertFalse(os.path.exists(targets[2].path))
+        self.assertTrue(all(target.exists() for target in targets))
+
+        # Evicted frames are loaded from their spill file, e.g. in another process
+        other = DataFrameTarget(targets[0].path, FrameStore())
+        pandas.testing.assert_frame_equal(other.load(), df)
+
+        targets[0].remove()
+        self.assertFalse(targets[0].exists())
+
+    def test_worker_process_spills(self):
+        store = FrameStore()
+        target = DataFrameTarget(os.path.join(self.temp_dir.name, "w.pickle"), store)
+        with mock.patch("multiprocessing.current_process") as current_process:
+            current_process.return_value.name = "Worker-1"
+            target.save(pandas.DataFrame({"A": range(5)}))
+
+        self.assertNotIn(target.path, store)
+        self.assertTrue(os.path.exists(target.path))
@@ -3,9 +3,11 @@ import unittest
 import tempfile
 import os
 
-from luigi_report_utils import inpt
+from luigi_report_utils import inpt, records
 from luigi_report_utils.tasks import EtlcmdTask
 
+from .etlcmd_standin import EtlcmdStandinTestCase
+
 
 class TestEtlcmdTask(unittest.TestCase):
     def test_etlcmd_task(self):
@@ -53,5 +55,58 @@ process "Test Process" {
                 self.assertEqual(f_in.read(), f_out.read())
 
 
+class TestEtlcmdTaskStream(EtlcmdStandinTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.input_file = os.path.join(self.temp_dir.name, "input.jsonl")
+        with open(self.input_file, "w") as f:
+            f.writelines(
+                [
+                    '{ "A":1, "B":10, "C":100 }\n',
+                    '{ "A":2, "B":20, "C":200 }\n',
+                    '{ "A":3, "B":30, "C":300 }\n',
+                ]
+            )
+
+        self.config_file = os.path.join(self.temp_dir.name, "config.hcl")
+        with open(self.config_file, "w") as f:
+            f.write('input = "%s"\n' % self.input_file)
+
+    def test_open_stream(self):
+        output_file = os.path.join(self.temp_dir.name, "out", "output.jsonl")
+        task = EtlcmdTask(
+            config_file=self.config_file, output_path=output_file, stream_stdout=True
+        )
+
+        df = records.load_jsonl(task.open_stream(), [records.SchemaField("B")])
+        self.assertEqual(list(df["B"]), [10, 20, 30])
+
+        self.assertTrue(task.complete())
+        with open(self.input_file, "r") as f_in:
+            with open(output_file, "r") as f_out:
+                self.assertEqual(f_in.read(), f_out.read())
+
+    def test_run_stream(self):
+        output_file = os.path.join(self.temp_dir.name, "output.jsonl")
+
+        success = luigi.build(
+            [
+                EtlcmdTask(
+                    config_file=self.config_file,
+                    output_path=output_file,
+                    stream_stdout=True,
+                )
+            ],
+            workers=1,
+            local_scheduler=True,
+        )
+        self.assertTrue(success)
+
+        with open(self.input_file, "r") as f_in:
+            with open(output_file, "r") as f_out:
+                self.assertEqual(f_in.read(), f_out.read())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,56 @@
+import luigi
+import unittest
+import os
+
+from luigi_report_utils.tasks import ShardedUdtExportTask
+
+from .etlcmd_standin import EtlcmdStandinTestCase
+
+_PROCESS = """
+process "Test Process" {
+    shard_index = "%%(shard_index)s"
+    shard_count = "%%(shard_count)s"
+    input = "%s"
+    output = "%%(output_path)s"
+}
+"""
+
+
+class TestShardedUdtExportTask(EtlcmdStandinTestCase):
+    def test_sharded_export(self):
+        input_file = os.path.join(self.temp_dir.name, "input.csv")
+        with open(input_file, "w") as f:
+            f.write("ID,VAL\n")
+            f.writelines(f"{i},{i * 10}\n" for i in range(10))
+
+        output_file = os.path.join(self.temp_dir.name, "output.csv")
+
+        task = ShardedUdtExportTask(
+            udt_host="localhost",
+            udt_username="user",
+            udt_password="password",
+            udt_bin="/usr/ud/bin",
+            udt_home="/usr/ud",
+            udt_acct="/usr/ud/acct",
+            process=_PROCESS % input_file,
+            output_path=output_file,
+            shard_count=3,
+            header_lines=1,
+        )
+        success = luigi.build([task], workers=3, local_scheduler=True)
+        self.assertTrue(success)
+
+        for shard_index in range(3):
+            self.assertTrue(os.path.exists(task.part_path(shard_index)))
+
+        with open(output_file, "r") as f:
+            lines = f.readlines()
+
+        self.assertEqual(lines[0], "ID,VAL\n")
+        self.assertEqual(
+            sorted(lines[1:]), sorted(f"{i},{i * 10}\n" for i in range(10))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+import luigi
+import pandas
+
+from luigi_report_utils import incremental, inpt, records
+
+_FIELD_DEFS = [records.SchemaField("ID"), records.SchemaField("VAL")]
+
+_DATA_PRIOR = """{"ID": "0", "VAL": "a"}
+{"ID": "1", "VAL": "b"}
+{"ID": "2", "VAL": "c"}
+"""
+
+_DATA_CURRENT = """{"ID": "0", "VAL": "a"}
+{"ID": "2", "VAL": "C"}
+{"ID": "3", "VAL": "d"}
+"""
+
+
+class TestIncremental(unittest.TestCase):
+    def test_load_changed(self):
+        _, diff = incremental.load_jsonl(
+            inpt.from_str(_DATA_PRIOR), _FIELD_DEFS, "ID", incremental.RecordSnapshot()
+        )
+        self.assertEqual(len(diff.inserted), 3)
+
+        df, diff = incremental.load_jsonl(
+            inpt.from_str(_DATA_CURRENT), _FIELD_DEFS, "ID", diff.snapshot
+        )
+
+        pandas.testing.assert_frame_equal(
+            pandas.DataFrame({"ID": ["2", "3"], "VAL": ["C", "d"]}), df
+        )
+        self.assertEqual(diff.inserted, [("3",)])
+        self.assertEqual(diff.changed, [("2",)])
+        self.assertEqual(diff.deleted, [("1",)])
+
+    def test_merge_changes(self):
+        _, diff = incremental.load_jsonl(
+            inpt.from_str(_DATA_PRIOR), _FIELD_DEFS, "ID", incremental.RecordSnapshot()
+        )
+        df, diff = incremental.load_jsonl(
+            inpt.from_str(_DATA_CURRENT), _FIELD_DEFS, "ID", diff.snapshot
+        )
+
+        df_prior = pandas.DataFrame({"ID": ["0", "1", "2"], "VAL": ["A", "B", "C"]})
+        df = incremental.merge_changes(df_prior, df, diff)
+
+        pandas.testing.assert_frame_equal(
+            pandas.DataFrame({"ID": ["0", "2", "3"], "VAL": ["A", "C", "d"]}), df
+        )
+
+    def test_merge_changes_typed_key(self):
+        field_defs = [
+            records.SchemaField("ID", type="int64", transform=str.strip),
+            records.SchemaField("VAL"),
+        ]
+        data_prior = _DATA_PRIOR.replace('"ID": "', '"ID": " ')
+        data_current = _DATA_CURRENT.replace('"ID": "', '"ID": " ')
+
+        df_prior, diff = incremental.load_jsonl(
+            inpt.from_str(data_prior), field_defs, "ID", incremental.RecordSnapshot()
+        )
+        df, diff = incremental.load_jsonl(
+            inpt.from_str(data_current), field_defs, "ID", diff.snapshot
+        )
+        df = incremental.merge_changes(df_prior, df, diff)
+
+        pandas.testing.assert_frame_equal(
+            pandas.DataFrame({"ID": [0, 2, 3], "VAL": ["a", "C", "d"]}), df
+        )
+
+    def test_snapshot_save_load(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(temp_dir.name, "snapshot.jsonl")
+
+        snapshot = incremental.RecordSnapshot({("0", 1): "abc", ("1", 2): "def"})
+        snapshot.save(luigi.LocalTarget(path))
+
+        loaded = incremental.RecordSnapshot.load(inpt.from_path(path))
+        self.assertEqual(loaded.hashes, snapshot.hashes)
+
+
+if __name__ == "__main__":
+    unittest.main()
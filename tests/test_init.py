@@ -0,0 +1,69 @@
+import json
+import subprocess
+import sys
+import unittest
+
+# Generous upper bound on the package import time, in seconds. Importing pandas alone
+# takes several times this long, so a regression that pulls it back in will trip it.
+_IMPORT_TIME_BUDGET = 0.1
+
+# Third-party packages that are expensive to import and must only be loaded on first use
+_HEAVY_MODULES = ("pandas", "numpy", "pathos", "dill", "multiprocess", "luigi")
+
+
+def _imported_heavy_modules(statement):
+    """Run `statement` in a fresh interpreter and return the heavy modules it loaded"""
+    script = "\n".join(
+        [
+            "import json, sys",
+            statement,
+            f"print(json.dumps([m for m in {_HEAVY_MODULES!r} if m in sys.modules]))",
+        ]
+    )
+    output = subprocess.check_output([sys.executable, "-c", script])
+    return json.loads(output)
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_import_package(self):
+        self.assertEqual(_imported_heavy_modules("import luigi_report_utils"), [])
+
+    def test_import_time(self):
+        script = "\n".join(
+            [
+                "import time",
+                "start = time.perf_counter()",
+                "import luigi_report_utils",
+                "print(time.perf_counter() - start)",
+            ]
+        )
+        elapsed = float(subprocess.check_output([sys.executable, "-c", script]))
+        self.assertLess(elapsed, _IMPORT_TIME_BUDGET)
+
+    def test_import_value_translator(self):
+        self.assertEqual(
+            _imported_heavy_modules("from luigi_report_utils import ValueTranslator"),
+            [],
+        )
+
+    def test_import_inpt(self):
+        self.assertEqual(
+            _imported_heavy_modules("from luigi_report_utils import inpt"), []
+        )
+
+    def test_submodule_access(self):
+        loaded = _imported_heavy_modules(
+            "import luigi_report_utils; luigi_report_utils.records.load_records"
+        )
+        self.assertIn("pandas", loaded)
+        self.assertNotIn("luigi", loaded)
+
+    def test_unknown_attribute(self):
+        import luigi_report_utils
+
+        with self.assertRaises(AttributeError):
+            luigi_report_utils.does_not_exist
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,10 @@
+import os
+import sys
+import stat
+import tempfile
 import unittest
 
-from luigi_report_utils import inpt
+from luigi_report_utils import inpt, records
 
 
 class TestInpt(unittest.TestCase):
@@ -10,5 +14,41 @@ class TestInpt(unittest.TestCase):
             self.assertEqual(f.read(), STR_IN)
 
 
+class TestProcessInpt(unittest.TestCase):
+    def test_stream(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        output_path = os.path.join(temp_dir.name, "output.jsonl")
+
+        script = "for i in range(3): print('{\"A\": \"%d\"}' % i, flush=True)"
+        stream = inpt.from_process(
+            [sys.executable, "-c", script], output_path=output_path
+        )
+
+        df = records.load_jsonl(stream, [records.SchemaField("A")])
+        self.assertEqual(list(df["A"]), ["0", "1", "2"])
+
+        with open(output_path, "r") as f:
+            self.assertEqual(f.read(), '{"A": "0"}\n{"A": "1"}\n{"A": "2"}\n')
+        self.assertEqual(os.listdir(temp_dir.name), ["output.jsonl"])
+
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(output_path).st_mode), 0o666 & ~umask)
+
+    def test_stream_failure(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        output_path = os.path.join(temp_dir.name, "output.jsonl")
+
+        script = "import sys; print('partial'); sys.exit(1)"
+        stream = inpt.from_process(
+            [sys.executable, "-c", script], output_path=output_path
+        )
+
+        with self.assertRaises(RuntimeError):
+            with stream.open() as f:
+                f.read()
+        self.assertEqual(os.listdir(temp_dir.name), [])
+
+
 if __name__ == "__main__":
     unittest.main()
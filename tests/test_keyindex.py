@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from luigi_report_utils import inpt, keyindex, records, validate
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_false_positive_rate(self):
+        bloom = keyindex.BloomFilter.for_capacity(10000, 0.01)
+        df_in = pandas.DataFrame({"K": range(10000)})
+        df_out = pandas.DataFrame({"K": range(10000, 30000)})
+
+        bloom.add(keyindex.key_hashes(df_in, ["K"]))
+
+        self.assertTrue(bloom.contains(keyindex.key_hashes(df_in, ["K"])).all())
+        fp_rate = bloom.contains(keyindex.key_hashes(df_out, ["K"])).mean()
+        self.assertLess(fp_rate, 0.02)
+        self.assertAlmostEqual(bloom.false_positive_rate(), 0.01, delta=0.005)
+
+
+class TestHyperLogLog(unittest.TestCase):
+    def test_count(self):
+        for n in (0, 100, 50000):
+            sketch = keyindex.HyperLogLog(12)
+            sketch.add(keyindex.key_hashes(pandas.DataFrame({"K": range(n)}), ["K"]))
+            self.assertLessEqual(abs(sketch.count() - n), n * sketch.relative_error * 3)
+
+    def test_merge(self):
+        a = keyindex.HyperLogLog(10)
+        b = keyindex.HyperLogLog(10)
+        a.add(keyindex.key_hashes(pandas.DataFrame({"K": range(0, 3000)}), ["K"]))
+        b.add(keyindex.key_hashes(pandas.DataFrame({"K": range(2000, 5000)}), ["K"]))
+        a.merge(b)
+        self.assertLessEqual(abs(a.count() - 5000), 5000 * a.relative_error * 3)
+
+        with self.assertRaises(ValueError):
+            a.merge(keyindex.HyperLogLog(12))
+
+
+class TestKeyIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "ref.keys")
+
+        ref_csv = "ID,SUB,NAME\n" + "".join(
+            f"{i},{i % 2},name-{i}\n" for i in range(0, 100, 2)
+        )
+        keyindex.KeyIndex.build(inpt.from_str(ref_csv), ["ID", "SUB"], self.path)
+
+    def test_contains(self):
+        index = keyindex.KeyIndex.load(self.path)
+        df = pandas.DataFrame({"A": [0, 1, 2, 98, 100], "B": ["0", "1", "1", "0", "0"]})
+
+        numpy.testing.assert_array_equal(
+            index.contains(df, ["A", "B"]), [True, False, False, True, False]
+        )
+
+    def test_xref_integrity(self):
+        index = keyindex.KeyIndex.load(self.path)
+        df = pandas.DataFrame({"A": range(10), "B": ["0"] * 10})
+
+        failed_records = list(validate.xref_integrity(df, ["A", "B"], index, ["ID", "SUB"]))
+        self.assertEqual([r[2] for r in failed_records], [1, 3, 5, 7, 9])
+
+    def test_apply_exclusion_list(self):
+        index = keyindex.KeyIndex.load(self.path)
+        df = pandas.DataFrame({"A": range(6), "B": ["0"] * 6})
+
+        records.apply_exclusion_list(df, index, [("A", "ID"), ("B", "SUB")])
+        self.assertEqual(list(df["A"]), [1, 3, 5])
+
+    def test_column_order(self):
+        index = keyindex.KeyIndex.load(self.path)
+
+        df = pandas.DataFrame({"A": range(6), "B": ["0"] * 6})
+        records.apply_exclusion_list(df, index, [("B", "SUB"), ("A", "ID")])
+        self.assertEqual(list(df["A"]), [1, 3, 5])
+
+        df = pandas.DataFrame({"A": range(10), "B": ["0"] * 10})
+        failed_records = list(validate.xref_integrity(df, ["B", "A"], index, ["SUB", "ID"]))
+        self.assertEqual([r[2] for r in failed_records], [1, 3, 5, 7, 9])
+
+        with self.assertRaises(ValueError):
+            list(validate.xref_integrity(df, ["A", "B"], index, ["NOPE", "X"]))
+        with self.assertRaises(ValueError):
+            records.apply_exclusion_list(df, index, [("A", "ID"), ("B", "NOPE")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import pandas
+
+from luigi_report_utils import memory
+
+
+class TestMemory(unittest.TestCase):
+    def test_parse_size(self):
+        self.assertEqual(memory.parse_size(1024), 1024)
+        self.assertEqual(memory.parse_size("512MB"), 512 * 1000 ** 2)
+        self.assertEqual(memory.parse_size("2GiB"), 2 * 1024 ** 3)
+        self.assertEqual(memory.parse_size("1.5 kb"), 1500)
+        with self.assertRaises(ValueError):
+            memory.parse_size("12 parsecs")
+
+    def test_spiller(self):
+        chunks = [pandas.DataFrame({"A": range(i * 10, i * 10 + 10)}) for i in range(5)]
+        spiller = memory.ChunkSpiller(memory.frame_size(chunks[0]) * 2)
+        for chunk in chunks:
+            spiller.add(chunk)
+
+        self.assertEqual(spiller.spilled_chunks, 3)
+        df = spiller.concat(ignore_index=True)
+        pandas.testing.assert_frame_equal(df, pandas.DataFrame({"A": range(50)}))
+
+        # Every chunk is reloaded alongside the concatenated frame
+        chunk_bytes = sum(memory.frame_size(chunk) for chunk in chunks)
+        self.assertEqual(spiller.peak_bytes, chunk_bytes + memory.frame_size(df))
+
+    def test_build_chunked(self):
+        df = memory.build_chunked(
+            lambda chunk: pandas.DataFrame({"A": chunk}), range(1000), 2000
+        )
+        pandas.testing.assert_frame_equal(df, pandas.DataFrame({"A": range(1000)}))
+
+    def test_build_chunked_lazy(self):
+        spiller = memory.build_chunked(
+            lambda chunk: pandas.DataFrame({"A": chunk}), range(1000), 2000, lazy=True
+        )
+        chunks = list(spiller)
+
+        self.assertGreater(spiller.spilled_chunks, 0)
+        self.assertEqual(spiller.shape, (1000, 1))
+        pandas.testing.assert_frame_equal(
+            pandas.concat(chunks, ignore_index=True),
+            pandas.DataFrame({"A": range(1000)}),
+        )
+        # Only one spilled chunk is reloaded at a time
+        largest = max(memory.frame_size(chunk) for chunk in chunks)
+        self.assertLessEqual(spiller.peak_bytes, spiller.memory_bytes + largest)
+        spiller.close()
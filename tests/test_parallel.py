@@ -95,6 +95,60 @@ class TestParallel(unittest.TestCase):
         )
         pandas.testing.assert_frame_equal(df_expected, df)
 
+    def test_df_apply_collect_writes(self):
+        df = pandas.DataFrame({"A": range(_SIZE), "B": range(_SIZE), "C": ""})
+
+        def _process_row(row):
+            row["B"] += 1
+            row["B"] += 1
+            if row["A"] % 2:
+                row["C"] = "odd"
+            return row["B"]
+
+        results = parallel.df_apply(
+            df, _process_row, return_df=False, collect_writes=True
+        )
+
+        self.assertEqual(results, list(range(2, _SIZE + 2)))
+        df_expected = pandas.DataFrame(
+            {
+                "A": range(_SIZE),
+                "B": range(2, _SIZE + 2),
+                "C": ["", "odd"] * (_SIZE // 2),
+            }
+        )
+        pandas.testing.assert_frame_equal(df_expected, df)
+
+    def test_df_apply_collect_writes_partial(self):
+        df = pandas.DataFrame(
+            {"A": [0, 1, 2], "C": [1.5, 2.5, 3.5], "D": ["a", "b", "c"]}
+        )
+
+        def _process_row(row):
+            if row["A"] == 1:
+                row["C"] = 0.25
+                row["D"] = 7
+
+        parallel.df_apply(df, _process_row, collect_writes=True)
+
+        # Writing some rows keeps the column's dtype where the values fit it
+        self.assertEqual(df["C"].dtype, "float64")
+        self.assertEqual(df["C"].tolist(), [1.5, 0.25, 3.5])
+        self.assertEqual(df["D"].tolist(), ["a", 7, "c"])
+
+    def test_df_apply_collect_writes_process_pool(self):
+        from pathos.pools import ProcessPool
+
+        df = pandas.DataFrame({"A": range(_SIZE), "B": 0})
+
+        def _process_row(row):
+            row["B"] = row["A"] * 2
+
+        parallel.df_apply(df, _process_row, pool=ProcessPool(2), collect_writes=True)
+
+        df_expected = pandas.DataFrame({"A": range(_SIZE), "B": range(0, _SIZE * 2, 2)})
+        pandas.testing.assert_frame_equal(df_expected, df)
+
 
 if __name__ == "__main__":
     unittest.main()
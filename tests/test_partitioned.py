@@ -0,0 +1,109 @@
+import unittest
+import pandas
+
+from luigi_report_utils import inpt, partitioned, records, validate, value_translator
+
+from .fixtures import DATA, FIELD_DEFS, ProcessPoolTestCase
+
+
+class TestPartitioned(ProcessPoolTestCase):
+    def test_load_jsonl(self):
+        df = records.load_jsonl(
+            inpt.from_str(DATA), FIELD_DEFS, partition_size=6, pool=self.pool
+        )
+        self.assertIsInstance(df, partitioned.PartitionedFrame)
+        self.assertEqual(df.npartitions, 4)
+
+        pandas.testing.assert_frame_equal(
+            records.load_jsonl(inpt.from_str(DATA), FIELD_DEFS), df.compute()
+        )
+
+    def test_load_empty(self):
+        df = records.load_jsonl(
+            inpt.from_str(""), FIELD_DEFS, partition_size=6, pool=self.pool
+        )
+        self.assertEqual(df.npartitions, 1)
+        self.assertEqual(df.shape, (0, 3))
+        self.assertEqual(list(df.columns), ["ID", "CODE", "SUBVAL"])
+
+        df = records.load_csv(inpt.from_str("A,B\n"), partition_size=3, pool=self.pool)
+        self.assertEqual(df.shape, (0, 2))
+
+    def test_load_csv(self):
+        data = "A,B\n" + "".join(f"{i},{i * 2}\n" for i in range(10))
+
+        df = records.load_csv(inpt.from_str(data), partition_size=3, pool=self.pool)
+        pandas.testing.assert_frame_equal(
+            records.load_csv(inpt.from_str(data)), df.compute()
+        )
+
+    def test_pipeline(self):
+        translator = value_translator.ValueTranslator()
+        translator.add_vtt(
+            "CODE", value_translator.ValueTranslationTable({("0",): "zero"})
+        )
+        df_exclude = pandas.DataFrame({"EXCLUDE_ID": ["3", "4"]})
+        expansion_paths = {"ID_SUB": ["SUBVAL", None]}
+        mappings = [["001", "ID", "KEY"], ["002", "ID_SUB", "SUB"], ["003", "CODE", "C"]]
+
+        def _run(df):
+            records.apply_exclusion_list(df, df_exclude, [("ID", "EXCLUDE_ID")])
+            translator.translate(df)
+            df = records.expand_multivalued(df, expansion_paths)
+            return records.apply_mappings(df, mappings)
+
+        df_expected = _run(records.load_jsonl(inpt.from_str(DATA), FIELD_DEFS))
+        df = _run(
+            records.load_jsonl(
+                inpt.from_str(DATA), FIELD_DEFS, partition_size=6, pool=self.pool
+            )
+        )
+
+        pandas.testing.assert_frame_equal(df_expected, df.compute())
+
+    def test_unique_keys(self):
+        df = pandas.DataFrame({"A": list(range(10)) * 2, "B": range(20)})
+        df_p = partitioned.PartitionedFrame.from_pandas(df, 3, pool=self.pool)
+
+        self.assertEqual(
+            sorted(validate.unique_keys(df_p, ["A"])),
+            sorted(validate.unique_keys(df, ["A"])),
+        )
+        self.assertEqual(list(validate.unique_keys(df_p, ["B"])), [])
+
+    def test_xref_integrity(self):
+        df_left = pandas.DataFrame({"A": range(10), "B": range(10, 20)})
+        df_right = pandas.DataFrame({"C": range(10, 20, 2), "D": range(5)})
+
+        df_left_p = partitioned.PartitionedFrame.from_pandas(df_left, 3, pool=self.pool)
+        df_right_p = partitioned.PartitionedFrame.from_pandas(
+            df_right, 2, pool=self.pool
+        )
+
+        expected = sorted(map(str, validate.xref_integrity(df_left, "B", df_right, "C")))
+        self.assertEqual(len(expected), 5)
+
+        for right in (df_right, df_right_p):
+            failed_records = validate.xref_integrity(df_left_p, "B", right, "C")
+            self.assertEqual(sorted(map(str, failed_records)), expected)
+
+        # A plain left-hand frame is checked against the whole partitioned right side
+        failed_records = validate.xref_integrity(df_left, "B", df_right_p, "C")
+        self.assertEqual(sorted(map(str, failed_records)), expected)
+
+    def test_xref_integrity_mixed_dtypes(self):
+        # Keys pandas.merge treats as equal land in the same partition across dtypes
+        df_left = pandas.DataFrame({"A": range(20)})
+        df_right = pandas.DataFrame({"B": [float(i) for i in range(20)]})
+
+        df_left_p = partitioned.PartitionedFrame.from_pandas(df_left, 3, pool=self.pool)
+        df_right_p = partitioned.PartitionedFrame.from_pandas(
+            df_right, 4, pool=self.pool
+        )
+
+        failed_records = validate.xref_integrity(df_left_p, "A", df_right_p, "B")
+        self.assertEqual(list(failed_records), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import pandas
+
+from luigi_report_utils import inpt, pipeline, records, validate, value_translator
+
+from .fixtures import DATA, FIELD_DEFS, ProcessPoolTestCase
+
+
+class TestPipeline(ProcessPoolTestCase):
+    def test_run(self):
+        translator = value_translator.ValueTranslator()
+        translator.add_vtt(
+            "CODE", value_translator.ValueTranslationTable({("0",): "zero"})
+        )
+        df_exclude = pandas.DataFrame({"EXCLUDE_ID": ["3", "4"]})
+        df_codes = pandas.DataFrame({"CODE": ["zero", "1", "2"]})
+        expansion_paths = {"ID_SUB": ["SUBVAL", None]}
+        mappings = [["001", "ID", "KEY"], ["002", "ID_SUB", "SUB"], ["003", "CODE", "C"]]
+
+        # The same steps run one full frame at a time
+        df_expected = records.load_jsonl(inpt.from_str(DATA), FIELD_DEFS)
+        records.apply_exclusion_list(df_expected, df_exclude, [("ID", "EXCLUDE_ID")])
+        df_expected = df_expected.reset_index(drop=True)
+        translator.translate(df_expected)
+        df_expected = records.expand_multivalued(df_expected, expansion_paths)
+        failures_expected = list(
+            validate.xref_integrity(df_expected, ["CODE"], df_codes, ["CODE"])
+        )
+        failures_expected += list(validate.unique_keys(df_expected, ["ID"]))
+        df_expected = records.apply_mappings(df_expected, mappings)
+
+        temp_dir = tempfile.TemporaryDirectory()
+        output = os.path.join(temp_dir.name, "output.csv")
+        p = pipeline.Pipeline(
+            [
+                pipeline.load(records.load_jsonl, inpt.from_str(DATA), FIELD_DEFS),
+                pipeline.apply_exclusion_list(df_exclude, [("ID", "EXCLUDE_ID")]),
+                pipeline.translate(translator),
+                pipeline.expand_multivalued(expansion_paths),
+                pipeline.xref_integrity(["CODE"], df_codes, ["CODE"]),
+                pipeline.unique_keys(["ID"]),
+                pipeline.apply_mappings(mappings),
+                pipeline.save_csv(output),
+            ],
+            chunksize=6,
+            pool=self.pool,
+        )
+
+        self.assertEqual(
+            [[stage.name for stage in segment] for segment in p.segments()],
+            [
+                ["load"],
+                [
+                    "apply_exclusion_list",
+                    "translate",
+                    "expand_multivalued",
+                    "xref_integrity",
+                ],
+                ["unique_keys"],
+                ["apply_mappings"],
+                ["save_csv"],
+            ],
+        )
+
+        result = p.run()
+
+        pandas.testing.assert_frame_equal(df_expected, result.df)
+        self.assertEqual(
+            sorted(map(str, failures_expected)), sorted(map(str, result.failures))
+        )
+        self.assertEqual(
+            [name for name, seconds in result.timings],
+            [stage.name for stage in p.stages],
+        )
+        pandas.testing.assert_frame_equal(
+            df_expected, records.load_csv(inpt.from_path(output))
+        )
@@ -1,7 +1,23 @@
+import io
+import os
+import gzip
+import stat
+import contextlib
+import json
+import tempfile
 import unittest
+import luigi
+import luigi.format
 import pandas
 
-from luigi_report_utils import inpt, records
+from pathos.pools import ThreadPool
+
+from luigi_report_utils import inpt, records, transforms, validate, value_translator
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
 
 
 class TestRecords(unittest.TestCase):
@@ -66,6 +82,31 @@ class TestRecords(unittest.TestCase):
                 ),
             )
 
+    def test_flatten_mv_no_mutation(self):
+        value = [{"B_MS": [{"B": "1"}]}]
+        self.assertEqual(records.flatten_mv(value), "1")
+        self.assertEqual(value, [{"B_MS": [{"B": "1"}]}])
+
+    def test_flatten_mv_column(self):
+        values = pandas.Series(["0", [{"B_MS": [{"B": "1"}]}], None, ["2"]])
+
+        pandas.testing.assert_series_equal(
+            records.flatten_mv_column(values), pandas.Series(["0", "1", None, "2"])
+        )
+        self.assertEqual(values[1], [{"B_MS": [{"B": "1"}]}])
+
+    def test_flatten_mv_column_errors(self):
+        values = pandas.Series([["0", "1"], ["2"], {"A": "3", "B": "4"}])
+
+        with self.assertRaises(records.FlattenError) as cm:
+            records.flatten_mv_column(values)
+        self.assertEqual([i for i, _ in cm.exception.failures], [0, 2])
+
+        pandas.testing.assert_series_equal(
+            records.flatten_mv_column(values, errors="coerce"),
+            pandas.Series([None, "2", None]),
+        )
+
     def test_load_jsonl_transform(self):
         inpt_str = '{"A":"test"}'
 
@@ -78,6 +119,120 @@ class TestRecords(unittest.TestCase):
 
         self.assertEqual(df.at[0, "A"], "PREFIX-TEST-SUFFIX")
 
+    def test_load_jsonl_vector_transform(self):
+        inpt_str = '{"A":" a ","B":"1"}\n{"A":" b ","B":"x"}\n{"A":" c ","B":"3"}'
+
+        df = records.load_jsonl(
+            inpt.from_str(inpt_str),
+            (
+                records.SchemaField(
+                    "A",
+                    transform=lambda v: self.fail("scalar transform was called"),
+                    vector_transform=[transforms.strip, transforms.upper],
+                ),
+                records.SchemaField(
+                    "B", vector_transform=transforms.to_numeric(), filter_none=True
+                ),
+            ),
+        )
+
+        pandas.testing.assert_frame_equal(
+            pandas.DataFrame({"A": ["A", "C"], "B": [1.0, 3.0]}), df
+        )
+
+    def test_save_csv_chunked(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(temp_dir.name, "output.csv")
+        df = pandas.DataFrame({"A": range(10), "B": range(10, 20)}, dtype=str)
+
+        records.save_csv(luigi.LocalTarget(path), df, chunksize=3, pool=ThreadPool(2))
+
+        with open(path, "r") as f:
+            self.assertEqual(f.read(), df.to_csv(index=False))
+        pandas.testing.assert_frame_equal(df, records.load_csv(inpt.from_path(path)))
+
+    def test_save_jsonl_chunked(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(temp_dir.name, "output.jsonl")
+        df = pandas.DataFrame({"A": range(10), "B": range(10, 20)}, dtype=str)
+
+        records.save_jsonl(path, df, chunksize=4)
+
+        df_saved = records.load_jsonl(
+            inpt.from_path(path), [records.SchemaField("A"), records.SchemaField("B")]
+        )
+        pandas.testing.assert_frame_equal(df, df_saved)
+
+    def test_load_many(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        df = pandas.DataFrame({"A": range(30), "B": range(30, 60)}, dtype=str)
+        for i in range(3):
+            path = os.path.join(temp_dir.name, f"part-{i}.csv")
+            records.save_csv(path, df.iloc[i * 10 : (i + 1) * 10])
+
+        pattern = os.path.join(temp_dir.name, "part-*.csv")
+        for kind in ("thread", "process"):
+            df_loaded = records.load_many(pattern, loader=records.load_csv, kind=kind)
+            pandas.testing.assert_frame_equal(df, df_loaded)
+
+        with self.assertRaises(ValueError):
+            records.load_many(os.path.join(temp_dir.name, "*.jsonl"))
+
+    def test_save_atomic(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(temp_dir.name, "output.csv")
+        df = pandas.DataFrame({"A": range(10)})
+
+        def _fail(start):
+            raise RuntimeError("serialization failed")
+
+        class FailingPool:
+            def imap(self, f, starts):
+                return map(_fail, starts)
+
+        with self.assertRaises(RuntimeError):
+            records.save_csv(path, df, chunksize=3, pool=FailingPool())
+        self.assertEqual(os.listdir(temp_dir.name), [])
+
+    def test_save_targets(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        df = pandas.DataFrame({"A": range(3)})
+
+        # Targets other than plain local files are written through their open()
+        class RemoteTarget:
+            path = "s3://bucket/key.csv"
+
+            def __init__(self):
+                self.written = []
+
+            @contextlib.contextmanager
+            def open(self, mode):
+                f = io.StringIO()
+                yield f
+                self.written.append(f.getvalue())
+
+        target = RemoteTarget()
+        cwd = os.getcwd()
+        os.chdir(temp_dir.name)
+        try:
+            records.save_csv(target, df)
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(target.written, [df.to_csv(index=False)])
+        self.assertEqual(os.listdir(temp_dir.name), [])
+
+        path = os.path.join(temp_dir.name, "output.csv.gz")
+        records.save_csv(luigi.LocalTarget(path, format=luigi.format.Gzip), df)
+        with gzip.open(path, "rt") as f:
+            self.assertEqual(f.read(), df.to_csv(index=False))
+
+        # Files get the permissions of the umask rather than mkstemp's 0600
+        path = os.path.join(temp_dir.name, "output.csv")
+        records.save_csv(luigi.LocalTarget(path), df)
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o666 & ~umask)
+
     def test_apply_mappings(self):
         df = pandas.DataFrame(
             {"A_1": range(10), "C_4": range(2, 12), "B_2": range(1, 11)}
@@ -98,6 +253,155 @@ class TestRecords(unittest.TestCase):
             df,
         )
 
+    def test_apply_mappings_no_mutation(self):
+        df = pandas.DataFrame({"A_1": range(3), "B_2": range(3)})
+        df_mapped = records.apply_mappings(df, [["001", "B_2", "B"]])
+
+        self.assertEqual(list(df.columns), ["A_1", "B_2"])
+        self.assertEqual(list(df_mapped.columns), ["B"])
+
+    def test_load_csv_mapping_columns(self):
+        INPT_STR = "A,B,C,D\n0,1,2,3\n4,5,6,7\n"
+        mappings = [["002", "C", "Z"], ["001", "A", "Y"]]
+
+        usecols = records.mapping_columns(mappings)
+        self.assertEqual(usecols, ["A", "C"])
+
+        df = records.load_csv(inpt.from_str(INPT_STR), usecols=usecols)
+        pandas.testing.assert_frame_equal(
+            pandas.DataFrame({"A": ["0", "4"], "C": ["2", "6"]}), df
+        )
+
+        df = records.apply_mappings(df, mappings)
+        pandas.testing.assert_frame_equal(
+            pandas.DataFrame({"Y": ["0", "4"], "Z": ["2", "6"]}), df
+        )
+
+    def test_load_jsonl_usecols(self):
+        inpt_str = '{"A":"0","B":"1","C":""}\n{"A":"2","B":"3","C":"x"}'
+
+        df = records.load_jsonl(
+            inpt.from_str(inpt_str),
+            [
+                records.SchemaField("A"),
+                records.SchemaField(
+                    "B", transform=lambda v: self.fail("unused field was transformed")
+                ),
+                records.SchemaField(
+                    "C", transform=lambda v: v or None, filter_none=True
+                ),
+            ],
+            usecols=["A"],
+        )
+
+        pandas.testing.assert_frame_equal(pandas.DataFrame({"A": ["2"]}), df)
+
+    def test_load_records_where(self):
+        data = [
+            {"ID": "A1", "STATUS": "open", "CODE": "x", "DATE": ""},
+            {"ID": "A2", "STATUS": "closed", "CODE": "x", "DATE": "2020"},
+            {"ID": "B3", "STATUS": "open", "CODE": "y", "DATE": "2021"},
+            {"ID": "A4", "STATUS": "open", "CODE": "z", "DATE": "2022"},
+            {"ID": "A5", "STATUS": "open", "CODE": "x"},
+            {"ID": "A6", "STATUS": "closed", "CODE": ["x", "y"], "DATE": "2023"},
+        ]
+
+        def _load(where):
+            df = records.load_records(
+                data,
+                [records.SchemaField("ID", transform=str.lower)],
+                where=where,
+            )
+            return df["ID"].tolist()
+
+        self.assertEqual(_load([("STATUS", "==", "open")]), ["a1", "b3", "a4", "a5"])
+        self.assertEqual(_load([("STATUS", "!=", "open")]), ["a2", "a6"])
+        self.assertEqual(_load([("CODE", "in", ["x", "y"])]), ["a1", "a2", "b3", "a5"])
+        # A multi-valued field isn't a member of the values
+        self.assertEqual(_load([("CODE", "not in", ["x", "y"])]), ["a4", "a6"])
+        self.assertEqual(
+            _load([("ID", "startswith", "A")]), ["a1", "a2", "a4", "a5", "a6"]
+        )
+        self.assertEqual(_load([("DATE", "isnull")]), ["a1", "a5"])
+        self.assertEqual(
+            _load([("DATE", "notnull"), ("STATUS", "==", "open")]), ["b3", "a4"]
+        )
+
+        with self.assertRaises(ValueError):
+            _load([("ID", "contains", "A")])
+
+    def test_load_csv_where_usecols(self):
+        INPT_STR = "A,B,C\n0,1,keep\n2,3,drop\n"
+
+        df = records.load_csv(
+            inpt.from_str(INPT_STR), usecols=["A"], where=[("C", "==", "keep")]
+        )
+
+        pandas.testing.assert_frame_equal(pandas.DataFrame({"A": ["0"]}), df)
+
+    def test_load_csv_infer_types(self):
+        INPT_STR = "I,F,D,C,S,N\n" + "".join(
+            f"{i},{i}.5,2020-01-{i + 1:02d},{'ab'[i % 2]},x{i},"
+            f"{'' if i % 3 else i * 100}\n"
+            for i in range(20)
+        )
+
+        df = records.load_csv(inpt.from_str(INPT_STR), infer_types=True)
+
+        self.assertEqual(
+            [str(dtype) for dtype in df.dtypes],
+            ["int8", "float32", "datetime64[ns]", "category", "object", "Int16"],
+        )
+        self.assertEqual(df["N"].tolist()[:4], [0, pandas.NA, pandas.NA, 300])
+
+        # The inferred field deffinitions can be pinned in code from their repr
+        df_str = records.load_csv(inpt.from_str(INPT_STR))
+        _, field_defs = records.infer_field_defs(df_str)
+        self.assertEqual(
+            repr(field_defs[-1]),
+            "SchemaField('N', type='Int16', none_value=None, "
+            "vector_transform=transforms.blank_to_none)",
+        )
+        df_pinned = records.load_csv(
+            inpt.from_str(INPT_STR),
+            eval(
+                repr(field_defs),
+                {"SchemaField": records.SchemaField, "transforms": transforms},
+            ),
+        )
+        pandas.testing.assert_frame_equal(df, df_pinned)
+
+    def test_infer_field_defs_fallback(self):
+        df = pandas.DataFrame({"A": ["1", "2", "x"], "B": ["1", "2", "300"]})
+
+        df, field_defs = records.infer_field_defs(df, sample_size=2)
+
+        # "A" looks like ints in the sample but isn't, "B" widens past the sample
+        self.assertEqual(df["A"].tolist(), ["1", "2", "x"])
+        self.assertEqual(
+            [(f.name, f.type) for f in field_defs], [("A", "str"), ("B", "int16")]
+        )
+
+    def test_infer_field_defs_leading_zeros(self):
+        df = pandas.DataFrame(
+            {
+                "A": ["00123", "00456"],
+                "B": ["+5", "6"],
+                "C": ["0.5", "007.5"],
+                "D": ["1", "2"],
+                "E": ["-1", "012"],
+            }
+        )
+
+        df, field_defs = records.infer_field_defs(df, sample_size=1)
+
+        # Values that wouldn't convert back to the same string are kept as strings
+        self.assertEqual(df["A"].tolist(), ["00123", "00456"])
+        self.assertEqual(
+            [(f.name, f.type) for f in field_defs],
+            [("A", "str"), ("B", "str"), ("C", "str"), ("D", "int8"), ("E", "str")],
+        )
+
     def test_apply_exclusion_list_basic(self):
         df = pandas.DataFrame({"A": range(10), "B": range(1, 11)})
 
@@ -127,6 +431,93 @@ class TestRecords(unittest.TestCase):
         )
 
 
+    def test_memory_limit(self):
+        data = [{"ID": str(i), "VAL": i, "SKIP": None if i % 3 else 1} for i in range(500)]
+        field_defs = [
+            records.SchemaField("ID", type="str"),
+            records.SchemaField("VAL", type="int64"),
+            records.SchemaField("SKIP", filter_none=True),
+        ]
+
+        df = records.load_records(data, field_defs, memory_limit="4KB")
+
+        pandas.testing.assert_frame_equal(df, records.load_records(data, field_defs))
+
+        # A lazily loaded frame is saved a chunk at a time
+        temp_dir = tempfile.TemporaryDirectory()
+        chunked_path = os.path.join(temp_dir.name, "chunked.csv")
+        path = os.path.join(temp_dir.name, "output.csv")
+        spiller = records.load_records(data, field_defs, memory_limit="4KB", lazy=True)
+        self.assertGreater(spiller.spilled_chunks, 0)
+        records.save_csv(chunked_path, spiller)
+        records.save_csv(path, df)
+        spiller.close()
+        with open(chunked_path, "r") as f_chunked, open(path, "r") as f:
+            self.assertEqual(f_chunked.read(), f.read())
+
+
+    def test_intern(self):
+        data = [
+            {"CODE": "".join(["A", "B"]), "ID": "".join(["x", str(i)])} for i in range(2000)
+        ]
+
+        df = records.load_records(
+            data,
+            [
+                records.SchemaField("CODE", intern=True),
+                records.SchemaField("ID", intern="auto"),
+            ],
+        )
+
+        codes = df["CODE"].tolist()
+        self.assertEqual(codes, ["AB"] * 2000)
+        self.assertEqual(len({id(code) for code in codes}), 1)
+
+        # The IDs are all distinct, so "auto" stops interning them after the sample
+        ids = df["ID"].tolist()
+        self.assertEqual(ids, [f"x{i}" for i in range(2000)])
+
+    def test_memoize(self):
+        calls = []
+
+        def _transform(value):
+            calls.append(value)
+            return records.flatten_mv(value)
+
+        field_def = records.SchemaField("VAL", transform=_transform, memoize=2)
+        data = [{"VAL": [{"V": v}]} for v in ("a", "b", "a", "a", "c", "a", "b")]
+
+        df = records.load_records(data, [field_def])
+
+        self.assertEqual(df["VAL"].tolist(), ["a", "b", "a", "a", "c", "a", "b"])
+        # "b" is evicted by "c" and loaded again
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(field_def.memo_info(), records.MemoInfo(3, 4, 2, 2))
+        self.assertIsNone(records.SchemaField("VAL").memo_info())
+
+    def test_memoize_keys(self):
+        memo = records._Memo(10)
+        self.assertEqual(memo(1, str), "1")
+        self.assertEqual(memo(True, str), "True")
+        self.assertEqual(memo({"A": [1]}, str), "{'A': [1]}")
+        self.assertEqual(memo({"A": [1]}, str), "{'A': [1]}")
+        self.assertEqual(memo({"A": {1}}, str), "{'A': {1}}")
+        self.assertEqual(memo.info(), records.MemoInfo(1, 4, 10, 3))
+
+    def test_intern_bounded(self):
+        interner = records._Interner(max_size=1)
+        a = interner("".join(["a", "b"]))
+        self.assertIs(interner("".join(["a", "b"])), a)
+        c = "".join(["c", "d"])
+        self.assertIs(interner(c), c)
+        self.assertEqual(len(interner.table), 1)
+
+        interner = records._Interner(auto=True)
+        for i in range(records._INTERN_SAMPLE_SIZE):
+            interner(str(i))
+        self.assertIsNone(interner.table)
+
+
 class TestExpandMV(unittest.TestCase):
     def test_basic(self):
         data_test = """{ "ID": "0", "SUBVAL": [ "0", "1", "2" ] }
@@ -154,6 +545,19 @@ class TestExpandMV(unittest.TestCase):
 
         pandas.testing.assert_frame_equal(df_expected, df)
 
+    def test_memory_limit(self):
+        df = pandas.DataFrame(
+            {"ID": [str(i) for i in range(300)], "SUBVAL": [["0", "1", "2"]] * 300}
+        )
+
+        df_expanded = records.expand_multivalued(
+            df, {"ID_SUB": ["SUBVAL", None]}, memory_limit="8KB"
+        )
+
+        pandas.testing.assert_frame_equal(
+            df_expanded, records.expand_multivalued(df, {"ID_SUB": ["SUBVAL", None]})
+        )
+
     def test_basic_no_drop(self):
         data_test = """{ "ID": "0", "SUBVAL": [ "0", "1", "2" ] }
 { "ID": "1", "SUBVAL": [ "0", "1", "2" ] }
@@ -235,6 +639,168 @@ class TestExpandMV(unittest.TestCase):
 
         pandas.testing.assert_frame_equal(df_expected, df)
 
+    def test_expand_missing(self):
+        data_test = """{ "ID": "0" }
+{ "ID": "1", "SUBVAL": [ "0", "1" ] }
+{ "ID": "2", "SUBVAL": null }
+"""
+        data_expected = """{ "ID": "1", "ID_SUB": "0" }
+{ "ID": "1", "ID_SUB": "1" }
+"""
+
+        df = records.load_jsonl(
+            inpt.from_str(data_test),
+            [records.SchemaField("ID"), records.SchemaField("SUBVAL"),],
+        )
+
+        df = records.expand_multivalued(df, {"ID_SUB": ["SUBVAL", None],})
+
+        df_expected = records.load_jsonl(
+            inpt.from_str(data_expected),
+            [records.SchemaField("ID"), records.SchemaField("ID_SUB"),],
+        )
+
+        pandas.testing.assert_frame_equal(df_expected, df)
+
+    def test_expand_missing_base(self):
+        df = pandas.DataFrame(
+            {"ID": ["0", "1"], "NAME": [None, "b"], "SUBVAL": [["0", "1"], ["2"]]}
+        )
+
+        df = records.expand_multivalued(df, {"ID_SUB": ["SUBVAL", None]})
+
+        # Missing values of the columns that aren't expanded get the default none_value
+        df_expected = pandas.DataFrame(
+            {"ID": ["0", "0", "1"], "NAME": ["", "", "b"], "ID_SUB": ["0", "1", "2"]}
+        )
+        pandas.testing.assert_frame_equal(df_expected, df)
+
+    def test_expand_nested(self):
+        df = pandas.DataFrame(
+            {
+                "ID": [0, 1],
+                "MV": [
+                    [
+                        {"ID_SUB": "a", "MS": [{"V": "a0"}, {"V": "a1"}]},
+                        {"ID_SUB": "b", "MS": []},
+                        {"ID_SUB": "c", "MS": {"V": "c0"}},
+                    ],
+                    [{"ID_SUB": "d", "MS": [{"V": "d0"}]}],
+                ],
+            }
+        )
+
+        df = records.expand_multivalued(
+            df,
+            {"ID_SUB": ["MV", None, "ID_SUB"], "VAL": ["MV", None, "MS", None, "V"]},
+        )
+
+        df_expected = pandas.DataFrame(
+            {
+                "ID": [0, 0, 0, 0, 1],
+                "ID_SUB": ["a", "a", "b", "c", "d"],
+                "VAL": ["a0", "a1", "", "c0", "d0"],
+            }
+        )
+        pandas.testing.assert_frame_equal(df_expected, df)
+
+    def test_expand_product(self):
+        df = pandas.DataFrame(
+            {"ID": ["0", "1"], "A": [["x", "y"], ["z"]], "B": [[1, 2], []]}
+        )
+        expansion_paths = {"A_VAL": ["A", None], "B_VAL": ["B", None]}
+
+        df_aligned = records.expand_multivalued(df, expansion_paths)
+        df_product = records.expand_multivalued(df, expansion_paths, mode="product")
+
+        pandas.testing.assert_frame_equal(
+            pandas.DataFrame(
+                {"ID": ["0", "0", "1"], "A_VAL": ["x", "y", "z"], "B_VAL": [1, 2, ""]}
+            ),
+            df_aligned,
+        )
+        pandas.testing.assert_frame_equal(
+            pandas.DataFrame(
+                {
+                    "ID": ["0", "0", "0", "0"],
+                    "A_VAL": ["x", "x", "y", "y"],
+                    "B_VAL": [1, 2, 1, 2],
+                }
+            ),
+            df_product,
+        )
+
+        with self.assertRaises(KeyError):
+            records.expand_multivalued(df, {"A_VAL": ["A"]})
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class TestArrowStrings(unittest.TestCase):
+    def assertArrow(self, df):
+        for col in df.columns:
+            self.assertEqual(str(df[col].dtype), "string", col)
+            self.assertEqual(df[col].dtype.storage, "pyarrow", col)
+
+    def test_pipeline(self):
+        rows = [
+            {"ID": str(i), "CODE": str(i % 4), "REF": chr(ord("a") + i)}
+            for i in range(10)
+        ]
+        rows[5]["REF"] = None
+        data = "".join(json.dumps(row) + "\n" for row in rows)
+
+        df = records.load_jsonl(
+            inpt.from_str(data),
+            [
+                records.SchemaField("ID", type="str"),
+                records.SchemaField("CODE"),
+                records.SchemaField("REF", none_value=None),
+            ],
+            string_dtype=records.ARROW_STRING_DTYPE,
+        )
+        self.assertArrow(df)
+
+        records.apply_exclusion_list(
+            df, pandas.DataFrame({"X": ["3", "7"]}), [("CODE", "X")]
+        )
+        self.assertEqual(list(df["ID"]), ["0", "1", "2", "4", "5", "6", "8", "9"])
+        self.assertArrow(df)
+
+        # Small translation table, one write to the column
+        translator = value_translator.ValueTranslator()
+        translator.add_vtt(
+            "CODE", value_translator.ValueTranslationTable({("0",): "zero"})
+        )
+        translator.translate(df)
+        self.assertEqual(df["CODE"].iloc[0], "zero")
+        self.assertArrow(df)
+
+        # Large translation table, row-wise replacement
+        translator = value_translator.ValueTranslator()
+        translator.add_vtt(
+            "CODE",
+            value_translator.ValueTranslationTable(
+                {(str(i),): f"code-{i}" for i in range(1, 100)}
+            ),
+        )
+        translator.translate(df)
+        self.assertEqual(df["CODE"].iloc[1], "code-1")
+        self.assertArrow(df)
+
+        df_right = pandas.DataFrame({"K": list("abcdefghij")}).astype(
+            records.ARROW_STRING_DTYPE
+        )
+        failed_records = list(
+            validate.xref_integrity(df, "REF", df_right, "K", ignore_blanks=True)
+        )
+        self.assertEqual([r[2] for r in failed_records], ["5"])
+
+        temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(temp_dir.name, "output.csv")
+        records.save_csv(path, df)
+        with open(path, "r") as f:
+            self.assertEqual(f.readlines()[5], "5,code-1,\n")
+
 
 if __name__ == "__main__":
     unittest.main()
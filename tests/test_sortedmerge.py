@@ -0,0 +1,74 @@
+import unittest
+import pandas
+
+from luigi_report_utils import records, sortedmerge, stream, validate
+
+
+class TestSortedMerge(unittest.TestCase):
+    def test_membership(self):
+        left = [(1,), (2,), (2,), (4,), (7,)]
+        right = [(2,), (3,), (4,), (4,), (8,)]
+        self.assertEqual(
+            list(sortedmerge.membership(left, right)), [False, True, True, True, False]
+        )
+
+    def test_duplicate_positions(self):
+        keys = [(1,), (2,), (2,), (2,), (3,), (4,), (4,)]
+        self.assertEqual(list(sortedmerge.duplicate_positions(keys)), [1, 2, 3, 5, 6])
+
+    def test_unsorted(self):
+        with self.assertRaises(sortedmerge.SortOrderError):
+            list(sortedmerge.duplicate_positions([(1,), (3,), (2,)]))
+        with self.assertRaises(sortedmerge.SortOrderError):
+            list(sortedmerge.membership([(5,)], [(1,), (3,), (2,)]))
+
+
+class TestSortedValidate(unittest.TestCase):
+    def test_xref_integrity(self):
+        df1 = pandas.DataFrame({"A": range(10), "B": range(10, 10 + 10)})
+        df2 = pandas.DataFrame({"C": range(10, 10 + 10, 2), "D": range(5)})
+
+        failed_records = list(
+            validate.xref_integrity(df1, "B", df2, "C", assume_sorted=True)
+        )
+        self.assertEqual([r[3] for r in failed_records], [11, 13, 15, 17, 19])
+
+        with self.assertRaises(sortedmerge.SortOrderError):
+            list(
+                validate.xref_integrity(
+                    df1.iloc[::-1], "B", df2, "C", assume_sorted=True
+                )
+            )
+
+    def test_unique_keys(self):
+        df = pandas.DataFrame({"A": [0, 1, 1, 2, 3, 3, 3], "B": range(7)})
+        self.assertEqual(
+            list(validate.unique_keys(df, ["A"], assume_sorted=True)),
+            list(validate.unique_keys(df, ["A"])),
+        )
+
+    def test_apply_exclusion_list(self):
+        df = pandas.DataFrame({"A": range(10), "B": range(1, 11)})
+        df_exclude = pandas.DataFrame({"B_exclude": [3, 5, 7]})
+
+        records.apply_exclusion_list(
+            df, df_exclude, [("B", "B_exclude")], assume_sorted=True
+        )
+        self.assertEqual(list(df["B"]), [1, 2, 4, 6, 8, 9, 10])
+
+    def test_stream(self):
+        rs = stream.from_records(
+            [{"A": a} for a in ["0", "1", "1", "2", "3"]], [records.SchemaField("A")]
+        )
+        failed_rows = list(stream.unique_keys(rs, ["A"], assume_sorted=True))
+        self.assertEqual([r[2] for r in failed_rows], ["1", "1"])
+
+        df_right = pandas.DataFrame({"K": ["1", "3"]})
+        failed_records = list(
+            stream.xref_integrity(rs, "A", df_right, "K", assume_sorted=True)
+        )
+        self.assertEqual([r[2] for r in failed_records], ["0", "2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import pandas
+
+from luigi_report_utils import inpt, records, stream, validate, value_translator
+
+_DATA = """{"ID": "0", "CODE": "A", "VAL": " a "}
+{"ID": "1", "CODE": "B", "VAL": null}
+{"ID": "2", "CODE": "C", "VAL": " c "}
+{"ID": "3", "CODE": "A", "VAL": " d "}
+"""
+
+_FIELD_DEFS = [
+    records.SchemaField("ID", type="int64"),
+    records.SchemaField("CODE"),
+    records.SchemaField("VAL", transform=lambda v: v.strip() if v else v),
+]
+
+
+class TestRecordStream(unittest.TestCase):
+    def test_matches_dataframe(self):
+        translator = value_translator.ValueTranslator()
+        translator.add_vtt(
+            "CODE", value_translator.ValueTranslationTable({("A",): "a"})
+        )
+        df_exclude = pandas.DataFrame({"EXCLUDE_ID": [2]})
+
+        rs = stream.from_jsonl(inpt.from_str(_DATA), _FIELD_DEFS)
+        rs = rs.exclude(df_exclude, [("ID", "EXCLUDE_ID")]).translate(translator)
+
+        df_expected = records.load_jsonl(inpt.from_str(_DATA), _FIELD_DEFS)
+        records.apply_exclusion_list(df_expected, df_exclude, [("ID", "EXCLUDE_ID")])
+        translator.translate(df_expected)
+
+        # Values are typed as they're read, so the int keys match the exclusion list
+        self.assertEqual(list(rs.select(["ID"])), [(0,), (1,), (3,)])
+        pandas.testing.assert_frame_equal(
+            df_expected.reset_index(drop=True), rs.to_frame()
+        )
+
+    def test_lazy(self):
+        calls = []
+
+        def _transform(v):
+            calls.append(v)
+            return v
+
+        rs = stream.from_jsonl(
+            inpt.from_str(_DATA), [records.SchemaField("ID", transform=_transform)]
+        )
+        rs = rs.filter(lambda r: r["ID"] != "1").select(["ID"])
+        self.assertEqual(calls, [])
+
+        self.assertEqual(list(rs), [("0",), ("2",), ("3",)])
+        self.assertEqual(calls, ["0", "1", "2", "3"])
+
+    def test_filter_none(self):
+        rs = stream.from_records(
+            [{"A": "0", "B": "x"}, {"A": "1"}],
+            [records.SchemaField("A"), records.SchemaField("B", filter_none=True)],
+        )
+        self.assertEqual(list(rs), [("0", "x")])
+
+
+class TestStreamValidate(unittest.TestCase):
+    def test_unique_keys(self):
+        rows = [{"A": a, "B": b} for a, b in [("0", "x"), ("1", "y"), ("0", "z")]]
+        field_defs = [records.SchemaField("A"), records.SchemaField("B")]
+
+        failed_rows = list(
+            stream.unique_keys(stream.from_records(rows, field_defs), ["A"])
+        )
+
+        df = records.load_records(rows, field_defs)
+        self.assertEqual(failed_rows, list(validate.unique_keys(df, ["A"])))
+
+    def test_xref_integrity(self):
+        rs = stream.from_records(
+            [{"A": str(i)} for i in range(10)], [records.SchemaField("A")]
+        )
+        df_right = pandas.DataFrame({"C": [str(i) for i in range(0, 10, 2)]})
+
+        failed_records = list(stream.xref_integrity(rs, "A", df_right, "C"))
+        self.assertEqual(len(failed_records), 5)
+        self.assertEqual(failed_records[0][2:], ["1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import pandas
+
+from luigi_report_utils import transforms
+
+
+class TestTransforms(unittest.TestCase):
+    def test_string_transforms(self):
+        values = pandas.Series([" a ", "B ", None])
+
+        pandas.testing.assert_series_equal(
+            transforms.strip(values), pandas.Series(["a", "B", None])
+        )
+        pandas.testing.assert_series_equal(
+            transforms.upper(values), pandas.Series([" A ", "B ", None])
+        )
+        pandas.testing.assert_series_equal(
+            transforms.lower(values), pandas.Series([" a ", "b ", None])
+        )
+
+    def test_blank_to_none(self):
+        values = pandas.Series(["a", "", "c"])
+        pandas.testing.assert_series_equal(
+            transforms.blank_to_none(values), pandas.Series(["a", None, "c"])
+        )
+
+    def test_to_numeric(self):
+        values = pandas.Series(["1", "2", "x"])
+        pandas.testing.assert_series_equal(
+            transforms.to_numeric()(values), pandas.Series([1.0, 2.0, None])
+        )
+
+    def test_to_datetime(self):
+        values = pandas.Series(["01/02/2020", "bad"])
+        result = transforms.to_datetime("%m/%d/%Y")(values)
+        self.assertEqual(result[0], pandas.Timestamp(2020, 1, 2))
+        self.assertTrue(pandas.isna(result[1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import itertools
 import unittest
 import pandas
 
@@ -45,3 +46,75 @@ class TestUniqueKeys(unittest.TestCase):
             ignore_index=True)
         failed_rows = list(validate.unique_keys(df, ["A", "B"]))
         self.assertEqual(failed_rows, [])
+
+    def test_external(self):
+        from pathos.pools import ProcessPool
+
+        df = pandas.DataFrame({"A": [i % 40 for i in range(100)], "B": range(100)})
+        df = df.loc[(df["A"] < 20) | (df.index < 40)]
+        chunks = (df.iloc[start : start + 15] for start in range(0, df.shape[0], 15))
+
+        failed_rows = list(
+            validate.unique_keys_external(
+                chunks, ["A"], partitions=4, pool=ProcessPool(2)
+            )
+        )
+
+        self.assertEqual(
+            sorted(failed_rows), sorted(validate.unique_keys(df, ["A"]))
+        )
+        # The rows of each duplicate group are together
+        keys = [row[2] for row in failed_rows]
+        self.assertEqual(len(keys), 60)
+        self.assertEqual(len(set(keys)), len(list(itertools.groupby(keys))))
+
+    def test_external_mixed_dtypes(self):
+        from pathos.pools import ThreadPool
+
+        # A chunk with a blank key is read as float64, the others as int64
+        chunks = [
+            pandas.DataFrame({"A": range(10), "B": 0}),
+            pandas.DataFrame({"A": [3.0, None], "B": 1}),
+        ]
+
+        failed_rows = list(
+            validate.unique_keys_external(
+                iter(chunks), ["A"], partitions=4, pool=ThreadPool(2)
+            )
+        )
+
+        self.assertEqual(
+            sorted(failed_rows),
+            sorted(validate.unique_keys(pandas.concat(chunks), ["A"])),
+        )
+        self.assertEqual(len(failed_rows), 2)
+
+
+class TestEstimates(unittest.TestCase):
+    def test_estimate_unique_keys(self):
+        df = pandas.DataFrame({"A": [i % 6000 for i in range(10000)], "B": 0})
+
+        estimate = validate.estimate_unique_keys(df, ["A"])
+
+        self.assertEqual(estimate.rows, 10000)
+        self.assertLessEqual(estimate.low, 4000)
+        self.assertGreaterEqual(estimate.high, 4000)
+        self.assertLess(estimate.high - estimate.low, 400)
+
+    def test_estimate_xref_integrity(self):
+        df_left = pandas.DataFrame({"A": [str(i) for i in range(40000)]})
+        df_left.loc[:999, "A"] = ""
+        df_right = pandas.DataFrame({"B": [str(i) for i in range(0, 40000, 4)]})
+
+        estimate = validate.estimate_xref_integrity(
+            df_left, "A", df_right, "B", ignore_blanks=True, random_state=0
+        )
+
+        self.assertEqual((estimate.rows, estimate.sampled), (39000, 10000))
+        self.assertLessEqual(estimate.low, 0.75)
+        self.assertGreaterEqual(estimate.high, 0.75)
+        self.assertAlmostEqual(estimate.orphans, 29250, delta=1000)
+
+    def test_z_score(self):
+        self.assertAlmostEqual(validate._z_score(0.95), 1.959964, places=6)
+        self.assertAlmostEqual(validate._z_score(0.99), 2.575829, places=6)
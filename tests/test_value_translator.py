@@ -67,6 +67,17 @@ class TestVTT(unittest.TestCase):
             df,
         )
 
+    def test_vtt_float(self):
+        # Both the small table (one column write) and the large table (row-wise) paths
+        # keep a float column's dtype
+        large = {(float(i),): float(i) for i in range(10)}
+        for valmap in ({(2.5,): 0.25}, {**large, (2.5,): 0.25}):
+            df = pandas.DataFrame({"A": range(3), "B": [1.5, 2.5, 3.5]})
+            value_translator.ValueTranslationTable(valmap).translate(df, ("B",))
+
+            self.assertEqual(df["B"].dtype, "float64")
+            self.assertEqual(df["B"].tolist(), [1.5, 0.25, 3.5])
+
 
 if __name__ == "__main__":
     unittest.main()